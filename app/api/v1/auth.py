@@ -2,18 +2,56 @@
 API Auth - Authentification JWT
 """
 from datetime import datetime, timezone
-from flask import request, jsonify, g
+from flask import request, jsonify, g, current_app, after_this_request
 from flask_jwt_extended import (
     create_access_token, create_refresh_token,
     jwt_required, get_jwt_identity, get_jwt
 )
 from marshmallow import ValidationError
+from sqlalchemy import select, update, func, lambda_stmt
 
 from . import api_v1
 from app.extensions import db
 from app.models.user import User
 from app.schemas.user import LoginSchema, UserSchema
 from app.core.audit_mixin import set_current_user_id
+from app.core.security import (
+    get_current_user, get_token_claims, get_token_claims_from_jwt, get_token_version
+)
+from app.core.cache import CachedSchema
+
+
+# Schemas instances (dump mis en cache par (id, updated_at))
+user_schema = CachedSchema(UserSchema())
+login_schema = LoginSchema()
+
+
+def defer_last_login_update(user_id, login_at):
+    """
+    Enregistre last_login une fois la réponse envoyée au client (call_on_close),
+    via un UPDATE direct: pas de commit sur le chemin critique du login.
+    """
+    app = current_app._get_current_object()
+
+    def update_last_login():
+        with app.app_context():
+            # Exécuté à la fermeture de la réponse: une erreur ne doit pas remonter au serveur WSGI
+            try:
+                db.session.execute(
+                    update(User)
+                    .where(User.id == user_id)
+                    .values(last_login=login_at, updated_at=login_at.replace(tzinfo=None), updated_by=user_id)
+                    .execution_options(synchronize_session=False)
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Mise à jour de last_login impossible (utilisateur %s)', user_id)
+
+    @after_this_request
+    def register(response):
+        response.call_on_close(update_last_login)
+        return response
 
 
 @api_v1.route('/auth/login', methods=['POST'])
@@ -63,31 +101,45 @@ def login():
       403:
         description: Compte désactivé
     """
-    schema = LoginSchema()
-
     try:
-        data = schema.load(request.get_json())
+        data = login_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
-    user = User.query.filter_by(email=data['email'], is_deleted=False).first()
+    # lambda_stmt: la requête compilée est mise en cache, seul l'email est lié.
+    # lower(email) correspond à l'index partiel ix_users_email_active
+    # (email déjà normalisé en minuscules par LoginSchema)
+    email = data['email']
+    user = db.session.execute(lambda_stmt(
+        lambda: select(User).where(func.lower(User.email) == email, User.is_deleted == False)
+    )).scalars().first()
 
-    if not user or not user.check_password(data['password']):
+    if not user:
+        User.check_dummy_password(data['password'])
+        return jsonify({'error': 'Email ou mot de passe incorrect'}), 401
+
+    if not user.check_password(data['password']):
         return jsonify({'error': 'Email ou mot de passe incorrect'}), 401
 
     if not user.is_active:
         return jsonify({'error': 'Compte désactivé'}), 403
 
-    # Mettre à jour la dernière connexion
-    user.last_login = datetime.now(timezone.utc)
-    db.session.commit()
+    login_at = datetime.now(timezone.utc)
+
+    if user.needs_rehash:
+        # Migrer les anciens hash pbkdf2 vers bcrypt (cas rare, écriture synchrone)
+        user.set_password(data['password'])
+        user.last_login = login_at
+        db.session.commit()
+    else:
+        # Mettre à jour la dernière connexion après l'envoi de la réponse
+        defer_last_login_update(user.id, login_at)
+        db.session.expunge(user)
+        user.last_login = login_at
+        user.updated_at = login_at.replace(tzinfo=None)
 
     # Créer les tokens avec les claims personnalisés
-    additional_claims = {
-        'role': user.role,
-        'email': user.email,
-        'nom': user.full_name
-    }
+    additional_claims = get_token_claims(user)
 
     access_token = create_access_token(
         identity=user.id,
@@ -102,7 +154,7 @@ def login():
         'access_token': access_token,
         'refresh_token': refresh_token,
         'token_type': 'Bearer',
-        'user': UserSchema().dump(user)
+        'user': user_schema.dump(user)
     }), 200
 
 
@@ -119,6 +171,7 @@ def refresh():
       Génère un nouveau access_token à partir du refresh_token.
       Utilisez cette route quand l'access_token expire (erreur 401).
       Le refresh_token doit être envoyé dans le header Authorization: Bearer <refresh_token>
+      Un compte désactivé, supprimé ou dont le rôle, l'email ou le nom a changé doit se reconnecter.
     security:
       - Bearer: []
     responses:
@@ -135,16 +188,16 @@ def refresh():
         description: Token invalide ou utilisateur inactif
     """
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    claims = get_jwt()
 
-    if not user or not user.is_active:
+    # Statut et version lus depuis le token: pas de chargement de la ligne User
+    if not claims.get('is_active'):
         return jsonify({'error': 'Utilisateur invalide ou inactif'}), 401
 
-    additional_claims = {
-        'role': user.role,
-        'email': user.email,
-        'nom': user.full_name
-    }
+    if claims.get('tv', 0) != get_token_version(user_id):
+        return jsonify({'error': 'Utilisateur invalide ou inactif'}), 401
+
+    additional_claims = get_token_claims_from_jwt(claims)
 
     access_token = create_access_token(
         identity=user_id,
@@ -193,16 +246,15 @@ def me():
       404:
         description: Utilisateur non trouvé
     """
-    user_id = get_jwt_identity()
-    set_current_user_id(user_id)
+    set_current_user_id(get_jwt_identity())
 
-    user = User.query.get(user_id)
+    user = get_current_user()
 
     if not user:
         return jsonify({'error': 'Utilisateur non trouvé'}), 404
 
     return jsonify({
-        'user': UserSchema().dump(user)
+        'user': user_schema.dump(user)
     }), 200
 
 
@@ -244,10 +296,9 @@ def change_password():
       404:
         description: Utilisateur non trouvé
     """
-    user_id = get_jwt_identity()
-    set_current_user_id(user_id)
+    set_current_user_id(get_jwt_identity())
 
-    user = User.query.get(user_id)
+    user = get_current_user()
 
     if not user:
         return jsonify({'error': 'Utilisateur non trouvé'}), 404
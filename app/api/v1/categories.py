@@ -1,22 +1,62 @@
 """
 API Categories - CRUD Catégories
 """
-from flask import request, jsonify
+from datetime import datetime
+
+from flask import request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
+from sqlalchemy import select, update, exists, values, column, Integer, lambda_stmt
+from sqlalchemy.orm import aliased
+from sqlalchemy.exc import IntegrityError
 
 from . import api_v1
 from app.extensions import db
 from app.models.category import Category
+from app.models.product import Product
 from app.schemas.category import CategorySchema, CategoryCreateSchema, CategoryUpdateSchema
-from app.core.audit_mixin import set_current_user_id
+from app.core.audit_mixin import set_current_user_id, get_current_user_id
 from app.core.security import role_required, UserRoles
-from app.core.utils import paginate_query
+from app.core.utils import paginate_query, keyset_paginate, make_etag, etag_matches, not_modified_response, etag_response, json_body_response
+from app.core.cache import CachedSchema, TTLCache
+
+
+# Schemas instances (dump mis en cache par (id, updated_at))
+category_schema = CachedSchema(CategorySchema())
+categories_schema = CachedSchema(CategorySchema(), many=True)
+category_create_schema = CategoryCreateSchema()
+category_update_schema = CategoryUpdateSchema()
+
+# Version (ETag) des catégories, recalculée au plus toutes les 5 secondes
+categories_version_cache = TTLCache(ttl=5)
+CATEGORIES_VERSION_KEY = 'categories:version'
+
+
+def get_categories_version():
+    """
+    Version courante des catégories actives: (MAX(updated_at), nombre)
+    côté catégories et produits (products_count fait partie du payload).
+    """
+    def compute():
+        category_version = db.session.query(
+            db.func.max(Category.updated_at), db.func.count(Category.id)
+        ).filter(Category.is_deleted == False, Category.is_active == True).one()
+        product_version = db.session.query(
+            db.func.max(Product.updated_at), db.func.count(Product.id)
+        ).filter(Product.is_deleted == False).one()
+        return tuple(category_version) + tuple(product_version)
 
+    return categories_version_cache.get_or_set(CATEGORIES_VERSION_KEY, compute)
 
-# Schemas instances
-category_schema = CategorySchema()
-categories_schema = CategorySchema(many=True)
+
+# Payload JSON encodé de /categories/all, indexé par ETag (une nouvelle version = une nouvelle clé)
+categories_payload_cache = TTLCache(ttl=60)
+
+
+def invalidate_categories_cache():
+    """Invalide la version et le payload des catégories (processus courant)"""
+    categories_version_cache.delete(CATEGORIES_VERSION_KEY)
+    categories_payload_cache.clear()
 
 
 @api_v1.route('/categories', methods=['GET'])
@@ -32,6 +72,8 @@ def get_categories():
       Retourne la liste paginée de toutes les catégories du catalogue.
       Les catégories sont triées par ordre d'affichage puis par nom.
       Filtre disponible: statut actif/inactif.
+      Pagination par curseur: passer `cursor` (vide pour la première page) puis
+      la valeur `next_cursor` retournée; aucun total n'est alors calculé.
     security:
       - Bearer: []
     parameters:
@@ -39,6 +81,10 @@ def get_categories():
         in: query
         type: boolean
         description: Filtrer par statut actif/inactif
+      - name: cursor
+        in: query
+        type: string
+        description: Curseur de pagination (keyset). Remplace page.
       - name: page
         in: query
         type: integer
@@ -53,13 +99,21 @@ def get_categories():
     """
     set_current_user_id(get_jwt_identity())
 
-    query = Category.query.filter_by(is_deleted=False)
+    query = db.session.query(Category).filter_by(is_deleted=False)
 
     # Filtres
     is_active = request.args.get('is_active')
     if is_active is not None:
         query = query.filter_by(is_active=is_active.lower() == 'true')
 
+    # Pagination par curseur (sans COUNT) si demandée, sinon pagination par page
+    if 'cursor' in request.args:
+        try:
+            result = keyset_paginate(query, [Category.ordre, Category.nom, Category.id], categories_schema)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(result), 200
+
     # Tri par ordre puis par nom
     query = query.order_by(Category.ordre.asc(), Category.nom.asc())
 
@@ -89,14 +143,38 @@ def get_all_categories():
     """
     set_current_user_id(get_jwt_identity())
 
-    categories = Category.query.filter_by(
-        is_deleted=False,
-        is_active=True
-    ).order_by(Category.ordre.asc(), Category.nom.asc()).all()
+    version = get_categories_version()
+    etag = make_etag(*version)
+    last_modified = version[0]
 
-    return jsonify({
-        'categories': [c.to_dict() for c in categories]
-    }), 200
+    # Le client possède déjà cette version: 304 sans requête ni sérialisation
+    if etag_matches(etag):
+        return not_modified_response(etag, last_modified)
+
+    body = categories_payload_cache.get(etag)
+
+    if body is None:
+        categories = db.session.query(Category).filter_by(
+            is_deleted=False,
+            is_active=True
+        ).order_by(Category.ordre.asc(), Category.nom.asc()).all()
+
+        # Nombre de produits par catégorie en une seule requête groupée
+        products_counts = dict(
+            db.session.query(Product.category_id, db.func.count(Product.id)).filter(
+                Product.is_deleted == False
+            ).group_by(Product.category_id).all()
+        )
+
+        body = current_app.json.dumps({
+            'categories': [
+                {**data, 'products_count': products_counts.get(data['id'], 0)}
+                for data in categories_schema.dump(categories)
+            ]
+        }).encode('utf-8')
+        categories_payload_cache.set(etag, body)
+
+    return json_body_response(body, etag, last_modified)
 
 
 @api_v1.route('/categories/<int:category_id>', methods=['GET'])
@@ -127,12 +205,17 @@ def get_category(category_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    category = Category.query.filter_by(id=category_id, is_deleted=False).first()
+    category = db.session.execute(lambda_stmt(
+        lambda: select(Category).where(Category.id == category_id, Category.is_deleted == False)
+    )).scalars().first()
 
     if not category:
         return jsonify({'error': 'Catégorie non trouvée'}), 404
 
-    return jsonify({'category': category.to_dict()}), 200
+    data = category.to_dict()
+    etag = make_etag(category.id, data['updated_at'], data['products_count'])
+
+    return etag_response({'category': data}, etag, category.updated_at)
 
 
 @api_v1.route('/categories/<int:category_id>/products', methods=['GET'])
@@ -164,15 +247,33 @@ def get_category_products(category_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    category = Category.query.filter_by(id=category_id, is_deleted=False).first()
-
-    if not category:
+    # Catégorie, produits actifs (LEFT JOIN) et nombre de produits non supprimés
+    # (actifs ou non, comme products_count) en une seule requête
+    counted = aliased(Product)
+    products_count = select(db.func.count(counted.id)).where(
+        counted.category_id == Category.id,
+        counted.is_deleted == False
+    ).scalar_subquery()
+
+    rows = db.session.query(Category, Product, products_count).outerjoin(
+        Product, db.and_(
+            Product.category_id == Category.id,
+            Product.is_deleted == False,
+            Product.is_active == True
+        )
+    ).filter(
+        Category.id == category_id,
+        Category.is_deleted == False
+    ).all()
+
+    if not rows:
         return jsonify({'error': 'Catégorie non trouvée'}), 404
 
-    products = category.products.filter_by(is_deleted=False, is_active=True).all()
+    category, _, count = rows[0]
+    products = [product for _, product, _ in rows if product is not None]
 
     return jsonify({
-        'category': category.to_dict(),
+        'category': category.to_dict(products_count=count),
         'products': [p.to_dict() for p in products]
     }), 200
 
@@ -220,10 +321,9 @@ def create_category():
         description: Données invalides
     """
     set_current_user_id(get_jwt_identity())
-    schema = CategoryCreateSchema()
 
     try:
-        data = schema.load(request.get_json())
+        data = category_create_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
@@ -236,7 +336,15 @@ def create_category():
     )
 
     db.session.add(category)
-    db.session.commit()
+
+    # L'index unique partiel garantit l'unicité en cas de requêtes concurrentes
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Une catégorie avec ce nom existe déjà'}), 400
+
+    invalidate_categories_cache()
 
     return jsonify({
         'message': 'Catégorie créée avec succès',
@@ -296,22 +404,27 @@ def update_category(category_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    category = Category.query.filter_by(id=category_id, is_deleted=False).first()
+    category = db.session.query(Category).filter_by(id=category_id, is_deleted=False).first()
 
     if not category:
         return jsonify({'error': 'Catégorie non trouvée'}), 404
 
-    schema = CategoryUpdateSchema()
-
     try:
-        data = schema.load(request.get_json())
+        data = category_update_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
     # Vérifier le nom s'il est modifié
     if 'nom' in data and data['nom'] != category.nom:
-        existing = Category.query.filter_by(nom=data['nom'], is_deleted=False).first()
-        if existing:
+        nom = data['nom']
+        name_taken = db.session.execute(lambda_stmt(
+            lambda: select(exists().where(
+                Category.nom == nom,
+                Category.is_deleted == False,
+                Category.id != category_id
+            ))
+        )).scalar()
+        if name_taken:
             return jsonify({'error': 'Une catégorie avec ce nom existe déjà'}), 400
 
     # Mettre à jour les champs
@@ -319,7 +432,13 @@ def update_category(category_id):
         if field in data:
             setattr(category, field, data[field])
 
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Une catégorie avec ce nom existe déjà'}), 400
+
+    invalidate_categories_cache()
 
     return jsonify({
         'message': 'Catégorie mise à jour avec succès',
@@ -362,13 +481,16 @@ def delete_category(category_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    category = Category.query.filter_by(id=category_id, is_deleted=False).first()
+    category = db.session.query(Category).filter_by(id=category_id, is_deleted=False).first()
 
     if not category:
         return jsonify({'error': 'Catégorie non trouvée'}), 404
 
     # Vérifier s'il y a des produits actifs
-    active_products = category.products.filter_by(is_deleted=False).count()
+    active_products = db.session.query(db.func.count(Product.id)).filter(
+        Product.category_id == category_id,
+        Product.is_deleted == False
+    ).scalar()
     if active_products > 0:
         return jsonify({
             'error': f'Impossible de supprimer: {active_products} produit(s) actif(s) dans cette catégorie'
@@ -376,6 +498,7 @@ def delete_category(category_id):
 
     category.soft_delete()
     db.session.commit()
+    invalidate_categories_cache()
 
     return jsonify({'message': 'Catégorie supprimée avec succès'}), 200
 
@@ -422,7 +545,7 @@ def reorder_categories():
       200:
         description: Ordre mis à jour avec succès
       400:
-        description: Données manquantes
+        description: Données manquantes ou invalides
     """
     set_current_user_id(get_jwt_identity())
 
@@ -430,11 +553,26 @@ def reorder_categories():
     if not data or 'order' not in data:
         return jsonify({'error': 'Données manquantes'}), 400
 
-    for item in data['order']:
-        category = Category.query.get(item['id'])
-        if category:
-            category.ordre = item['ordre']
+    try:
+        rows = [(int(item['id']), int(item['ordre'])) for item in data['order']]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Données invalides'}), 400
+
+    if rows:
+        # Un seul UPDATE ... FROM (VALUES ...): aucune lecture, aucun objet ORM.
+        # Les ids inconnus ne correspondent à aucune ligne.
+        # L'UPDATE direct ne déclenche pas les listeners d'audit: renseigner les champs ici
+        new_order = values(
+            column('id', Integer), column('ordre', Integer), name='new_order'
+        ).data(rows)
+        db.session.execute(
+            update(Category)
+            .where(Category.id == new_order.c.id)
+            .values(ordre=new_order.c.ordre, updated_at=datetime.utcnow(), updated_by=get_current_user_id())
+            .execution_options(synchronize_session=False)
+        )
 
     db.session.commit()
+    invalidate_categories_cache()
 
     return jsonify({'message': 'Ordre mis à jour avec succès'}), 200
@@ -1,17 +1,47 @@
 """
 API Dashboard - KPIs et statistiques
 """
-from flask import request, jsonify
+from flask import request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from . import api_v1
 from app.core.audit_mixin import set_current_user_id
-from app.core.utils import get_date_range_params
+from app.core.utils import get_date_range_params, json_body_response
+from app.core.cache import cached_response
 from app.services.dashboard_service import DashboardService
 
 
+def envelope_template(key):
+    """
+    Gabarit pré-encodé de la réponse {"periode": {...}, "<key>": ...},
+    clés dans l'ordre trié de jsonify. Seuls les dates et le contenu varient.
+    """
+    parts = {
+        'periode': b'"periode":{"end_date":"%(end_date)b","start_date":"%(start_date)b"}',
+        key: b'"' + key.encode() + b'":%(payload)b'
+    }
+    return b'{' + b','.join(parts[k] for k in sorted(parts)) + b'}'
+
+
+def render_envelope(template, periode, payload):
+    """Remplit un gabarit avec la période et le contenu déjà encodé (bytes)"""
+    return json_body_response(template % {
+        b'start_date': periode['start_date'].encode(),
+        b'end_date': periode['end_date'].encode(),
+        b'payload': payload
+    })
+
+
+# Gabarits des réponses, construits une seule fois à l'import
+KPIS_TEMPLATE = envelope_template('kpis')
+CHIFFRE_AFFAIRES_TEMPLATE = envelope_template('chiffre_affaires')
+VENTES_TEMPLATE = envelope_template('ventes')
+PANIER_MOYEN_TEMPLATE = envelope_template('panier_moyen')
+
+
 @api_v1.route('/dashboard/summary', methods=['GET'])
 @jwt_required()
+@cached_response()
 def dashboard_summary():
     """
     Résumé du dashboard avec tous les KPIs principaux
@@ -42,19 +72,16 @@ def dashboard_summary():
         description: Ensemble des KPIs avec période et comparaison
     """
     set_current_user_id(get_jwt_identity())
-    start_date, end_date = get_date_range_params()
+    start_date, end_date, periode = get_date_range_params()
 
-    return jsonify({
-        'periode': {
-            'start_date': start_date.strftime('%Y-%m-%d'),
-            'end_date': end_date.strftime('%Y-%m-%d')
-        },
-        'kpis': DashboardService.get_kpis_avances(start_date, end_date)
-    }), 200
+    kpis = DashboardService.get_kpis_avances(start_date, end_date)
+
+    return render_envelope(KPIS_TEMPLATE, periode, current_app.json.dumpb(kpis))
 
 
 @api_v1.route('/dashboard/chiffre-affaires', methods=['GET'])
 @jwt_required()
+@cached_response()
 def chiffre_affaires():
     """
     Chiffre d'affaires total sur la période
@@ -84,21 +111,16 @@ def chiffre_affaires():
         description: Montant total du chiffre d'affaires
     """
     set_current_user_id(get_jwt_identity())
-    start_date, end_date = get_date_range_params()
+    start_date, end_date, periode = get_date_range_params()
 
     ca = DashboardService.get_chiffre_affaires(start_date, end_date)
 
-    return jsonify({
-        'periode': {
-            'start_date': start_date.strftime('%Y-%m-%d'),
-            'end_date': end_date.strftime('%Y-%m-%d')
-        },
-        'chiffre_affaires': ca
-    }), 200
+    return render_envelope(CHIFFRE_AFFAIRES_TEMPLATE, periode, current_app.json.dumpb(ca))
 
 
 @api_v1.route('/dashboard/ventes-par-jour', methods=['GET'])
 @jwt_required()
+@cached_response()
 def ventes_par_jour():
     """
     Ventes groupées par jour
@@ -128,21 +150,16 @@ def ventes_par_jour():
         description: Liste des ventes par jour avec date, nb_commandes et montant
     """
     set_current_user_id(get_jwt_identity())
-    start_date, end_date = get_date_range_params()
+    start_date, end_date, periode = get_date_range_params()
 
     ventes = DashboardService.get_ventes_par_jour(start_date, end_date)
 
-    return jsonify({
-        'periode': {
-            'start_date': start_date.strftime('%Y-%m-%d'),
-            'end_date': end_date.strftime('%Y-%m-%d')
-        },
-        'ventes': ventes
-    }), 200
+    return render_envelope(VENTES_TEMPLATE, periode, current_app.json.dumpb(ventes))
 
 
 @api_v1.route('/dashboard/commandes', methods=['GET'])
 @jwt_required()
+@cached_response()
 def commandes_stats():
     """
     Statistiques des commandes par statut
@@ -172,16 +189,12 @@ def commandes_stats():
         description: Total et décompte par statut
     """
     set_current_user_id(get_jwt_identity())
-    start_date, end_date = get_date_range_params()
+    start_date, end_date, periode = get_date_range_params()
 
-    total = DashboardService.get_nombre_commandes(start_date, end_date)
-    par_statut = DashboardService.get_commandes_par_statut(start_date, end_date)
+    total, par_statut = DashboardService.get_commandes_stats(start_date, end_date)
 
     return jsonify({
-        'periode': {
-            'start_date': start_date.strftime('%Y-%m-%d'),
-            'end_date': end_date.strftime('%Y-%m-%d')
-        },
+        'periode': periode,
         'total': total,
         'par_statut': par_statut
     }), 200
@@ -189,6 +202,7 @@ def commandes_stats():
 
 @api_v1.route('/dashboard/commandes-details', methods=['GET'])
 @jwt_required()
+@cached_response()
 def commandes_details():
     """
     Détails des commandes par jour avec articles
@@ -218,21 +232,24 @@ def commandes_details():
         description: Commandes détaillées groupées par jour
     """
     set_current_user_id(get_jwt_identity())
-    start_date, end_date = get_date_range_params()
+    start_date, end_date, periode = get_date_range_params()
 
-    details = DashboardService.get_details_commandes_par_jour(start_date, end_date)
+    # Réponse en flux: un jour sérialisé à la fois (mêmes clés, triées comme jsonify)
+    def generate():
+        dumpb = current_app.json.dumpb
+        yield b'{"details":['
+        for i, day in enumerate(DashboardService.iter_details_commandes_par_jour(start_date, end_date)):
+            if i:
+                yield b','
+            yield dumpb(day)
+        yield b'],"periode":' + dumpb(periode) + b'}'
 
-    return jsonify({
-        'periode': {
-            'start_date': start_date.strftime('%Y-%m-%d'),
-            'end_date': end_date.strftime('%Y-%m-%d')
-        },
-        'details': details
-    }), 200
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 
 @api_v1.route('/dashboard/ventes-par-article', methods=['GET'])
 @jwt_required()
+@cached_response()
 def ventes_par_article():
     """
     Ventes par article (top vendus)
@@ -267,22 +284,18 @@ def ventes_par_article():
         description: Liste des top produits avec statistiques de vente
     """
     set_current_user_id(get_jwt_identity())
-    start_date, end_date = get_date_range_params()
+    start_date, end_date, periode = get_date_range_params()
     limit = request.args.get('limit', 10, type=int)
 
-    ventes = DashboardService.get_ventes_par_article(start_date, end_date, limit=limit)
+    # Tableau encodé par PostgreSQL, inséré tel quel dans la réponse
+    ventes = DashboardService.get_ventes_par_article_json(start_date, end_date, limit=limit)
 
-    return jsonify({
-        'periode': {
-            'start_date': start_date.strftime('%Y-%m-%d'),
-            'end_date': end_date.strftime('%Y-%m-%d')
-        },
-        'ventes': ventes
-    }), 200
+    return render_envelope(VENTES_TEMPLATE, periode, ventes.encode())
 
 
 @api_v1.route('/dashboard/ventes-par-categorie', methods=['GET'])
 @jwt_required()
+@cached_response()
 def ventes_par_categorie():
     """
     Ventes par catégorie
@@ -312,17 +325,12 @@ def ventes_par_categorie():
         description: Ventes agrégées par catégorie avec pourcentages
     """
     set_current_user_id(get_jwt_identity())
-    start_date, end_date = get_date_range_params()
+    start_date, end_date, periode = get_date_range_params()
 
-    ventes = DashboardService.get_ventes_par_categorie(start_date, end_date)
+    # Tableau encodé par PostgreSQL, inséré tel quel dans la réponse
+    ventes = DashboardService.get_ventes_par_categorie_json(start_date, end_date)
 
-    return jsonify({
-        'periode': {
-            'start_date': start_date.strftime('%Y-%m-%d'),
-            'end_date': end_date.strftime('%Y-%m-%d')
-        },
-        'ventes': ventes
-    }), 200
+    return render_envelope(VENTES_TEMPLATE, periode, ventes.encode())
 
 
 @api_v1.route('/dashboard/etat-stocks', methods=['GET'])
@@ -354,6 +362,7 @@ def etat_stocks():
 
 @api_v1.route('/dashboard/panier-moyen', methods=['GET'])
 @jwt_required()
+@cached_response()
 def panier_moyen():
     """
     Panier moyen sur la période
@@ -383,14 +392,8 @@ def panier_moyen():
         description: Montant du panier moyen arrondi à 2 décimales
     """
     set_current_user_id(get_jwt_identity())
-    start_date, end_date = get_date_range_params()
+    start_date, end_date, periode = get_date_range_params()
 
     panier = DashboardService.get_panier_moyen(start_date, end_date)
 
-    return jsonify({
-        'periode': {
-            'start_date': start_date.strftime('%Y-%m-%d'),
-            'end_date': end_date.strftime('%Y-%m-%d')
-        },
-        'panier_moyen': round(panier, 2)
-    }), 200
+    return render_envelope(PANIER_MOYEN_TEMPLATE, periode, current_app.json.dumpb(panier))
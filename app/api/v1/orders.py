@@ -1,27 +1,163 @@
 """
 API Orders - Gestion des commandes
 """
-from flask import request, jsonify
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
+from sqlalchemy import func, tuple_, update, select, case
+from sqlalchemy.orm import selectinload, joinedload
 
 from . import api_v1
 from app.extensions import db
 from app.models.order import Order, OrderItem, OrderStatus, ItemVerificationStatus, OrderHistory, OrderHistoryEvent
+from app.models.product import Product
 from app.schemas.order import (
     OrderSchema, OrderCreateSchema, OrderUpdateSchema,
-    OrderStatusUpdateSchema, OrderItemCreateSchema,
+    OrderStatusUpdateSchema, OrderItemCreateSchema, OrderItemQuantityUpdateSchema,
     OrderPaymentSchema, OrderCancelSchema
 )
-from app.core.audit_mixin import set_current_user_id
+from app.core.audit_mixin import set_current_user_id, get_current_user_id
 from app.core.security import role_required, UserRoles
-from app.core.utils import paginate_query
+from app.core.utils import keyset_paginate, get_pagination_params, paginate_page, search_pattern, json_body_response
 from app.services.order_service import OrderService
 
 
 # Schemas instances
 order_schema = OrderSchema()
 orders_schema = OrderSchema(many=True)
+order_create_schema = OrderCreateSchema()
+order_update_schema = OrderUpdateSchema()
+order_item_create_schema = OrderItemCreateSchema()
+order_item_quantity_schema = OrderItemQuantityUpdateSchema()
+order_status_update_schema = OrderStatusUpdateSchema()
+order_cancel_schema = OrderCancelSchema()
+order_payment_schema = OrderPaymentSchema()
+
+# Valeurs de statut, calculées une seule fois (validation des filtres, GET /orders/statuses)
+_ORDER_STATUS_LIST = [s.value for s in OrderStatus]
+_ORDER_STATUS_VALUES = frozenset(_ORDER_STATUS_LIST)
+_VERIFICATION_STATUS_VALUES = frozenset(s.value for s in ItemVerificationStatus)
+
+# Statuts autorisant une opération
+_EDITABLE_STATUSES = frozenset({OrderStatus.BROUILLON.value})
+
+# Taille des lots de l'export NDJSON (GET /orders/stream)
+ORDERS_STREAM_BATCH_SIZE = 500
+
+# Colonnes de tri autorisées (paramètre sort), created_at par défaut
+_SORTABLE_COLS = {
+    'created_at': Order.created_at,
+    'updated_at': Order.updated_at,
+    'numero': Order.numero,
+    'status': Order.status,
+    'montant_total': Order.montant_total,
+    'total_amount': Order.montant_total
+}
+# Colonnes de tri utilisables avec la pagination par curseur (non nulles, encodables en JSON)
+_KEYSET_SORTABLE_COLS = {
+    'created_at': Order.created_at,
+    'updated_at': Order.updated_at,
+    'numero': Order.numero,
+    'status': Order.status
+}
+
+
+@contextmanager
+def _write_transaction():
+    """
+    Valide la session en fin de bloc, l'annule si une exception en sort
+    (erreur métier ValueError comprise): aucune écriture partielle ne survit.
+    """
+    try:
+        yield
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _order_detail_options():
+    """
+    Chargement de tout ce que lit to_dict(include_items=True): lignes, produits
+    (et leur catégorie), livreur. Une requête pour la commande, une pour les lignes,
+    au lieu d'un SELECT par produit.
+    """
+    return (
+        selectinload(Order.items).joinedload(OrderItem.product).joinedload(Product.category),
+        joinedload(Order.livreur)
+    )
+
+
+def _filter_orders(query):
+    """Applique les filtres de liste de la requête (status, search, livreur_id)"""
+    status = request.args.get('status')
+    if status and status in _ORDER_STATUS_VALUES:
+        query = query.filter_by(status=status)
+
+    pattern = search_pattern(request.args.get('search'))
+    if pattern:
+        query = query.filter(_order_search_text().ilike(pattern, escape='\\'))
+
+    livreur_id = request.args.get('livreur_id', type=int)
+    if livreur_id:
+        query = query.filter_by(livreur_id=livreur_id)
+
+    return query
+
+
+def _order_search_text():
+    """
+    Numéro, nom et téléphone du client concaténés: un seul ILIKE servi par l'index
+    trigramme ix_orders_search_trgm (même expression, voir migration 016).
+    """
+    return (
+        func.coalesce(Order.numero, '') + ' ' +
+        func.coalesce(Order.client_nom, '') + ' ' +
+        func.coalesce(Order.client_telephone, '')
+    )
+
+
+def _order_payload(order):
+    """
+    Commande renvoyée par les écritures légères (quantité, statut, paiement, livreur):
+    complète par défaut, résumé sans lignes avec ?include=summary.
+    """
+    if request.args.get('include') == 'summary':
+        return {
+            'id': order.id,
+            'numero': order.numero,
+            'status': order.status,
+            'montant_total': order.total_amount,
+            'est_paye': order.is_paid,
+            'livreur_id': order.livreur_id,
+            'updated_at': order.updated_at.isoformat() if order.updated_at else None
+        }
+    return order.to_dict(include_items=True)
+
+
+def _get_order_item(order, item_id):
+    """
+    Ligne item_id de la commande (None si absente ou d'une autre commande).
+    Les lignes sont chargées avec la commande: lecture dans l'identity map, sans SELECT.
+    """
+    item = db.session.get(OrderItem, item_id)
+    if item is None or item.order_id != order.id:
+        return None
+    return item
+
+
+def _get_order(order_id):
+    """
+    Commande non supprimée par id, lignes et produits préchargés (None si absente).
+    Passe par l'identity map: aucun SELECT si la commande est déjà dans la session.
+    """
+    order = db.session.get(Order, order_id, options=_order_detail_options())
+    if order is None or order.is_deleted:
+        return None
+    return order
 
 
 @api_v1.route('/orders', methods=['GET'])
@@ -36,7 +172,7 @@ def get_orders():
     description: |
       Retourne la liste paginée des commandes avec possibilité de filtrage.
       Filtres disponibles: statut, recherche (numéro/client/téléphone), livreur assigné.
-      Tri configurable par n'importe quel champ (défaut: created_at desc).
+      Tri sur created_at, updated_at, numero, status ou montant_total (défaut: created_at desc).
     security:
       - Bearer: []
     parameters:
@@ -56,14 +192,19 @@ def get_orders():
       - name: sort
         in: query
         type: string
+        enum: [created_at, updated_at, numero, status, montant_total, total_amount]
         default: created_at
-        description: Champ de tri
+        description: Champ de tri (created_at si non reconnu)
       - name: order
         in: query
         type: string
         enum: [asc, desc]
         default: desc
         description: Ordre de tri
+      - name: cursor
+        in: query
+        type: string
+        description: Curseur de pagination (keyset sur created_at, id). Remplace page; vide pour la première page.
       - name: page
         in: query
         type: integer
@@ -72,6 +213,13 @@ def get_orders():
         in: query
         type: integer
         default: 20
+      - name: exact_count
+        in: query
+        type: boolean
+        default: false
+        description: |
+          Forcer le COUNT(*) exact. Sinon, au-delà de 50 000 lignes estimées,
+          total et pages valent null et total_estimate donne l'estimation PostgreSQL.
     responses:
       200:
         description: Liste paginée des commandes
@@ -120,35 +268,104 @@ def get_orders():
     query = Order.query.filter_by(is_deleted=False)
 
     # Filtres
-    status = request.args.get('status')
-    if status and status in [s.value for s in OrderStatus]:
-        query = query.filter_by(status=status)
-
-    search = request.args.get('search')
-    if search:
-        search_filter = f'%{search}%'
-        query = query.filter(
-            db.or_(
-                Order.numero.ilike(search_filter),
-                Order.client_nom.ilike(search_filter),
-                Order.client_telephone.ilike(search_filter)
-            )
-        )
-
-    livreur_id = request.args.get('livreur_id', type=int)
-    if livreur_id:
-        query = query.filter_by(livreur_id=livreur_id)
+    query = _filter_orders(query)
 
     # Tri
     sort = request.args.get('sort', 'created_at')
     order = request.args.get('order', 'desc')
-    if hasattr(Order, sort):
-        sort_col = getattr(Order, sort)
-        query = query.order_by(sort_col.desc() if order == 'desc' else sort_col.asc())
 
-    result = paginate_query(query, orders_schema)
+    # Pagination par curseur (sans COUNT ni OFFSET) si demandée, sinon pagination par page
+    if 'cursor' in request.args:
+        if sort != 'created_at':
+            return jsonify({'error': 'La pagination par curseur ne supporte que le tri par created_at'}), 400
+        try:
+            result = keyset_paginate(
+                query.options(*_order_detail_options()), [Order.created_at, Order.id], orders_schema,
+                descending=order == 'desc'
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(result), 200
+
+    sort_col = _SORTABLE_COLS.get(sort, Order.created_at)
+    query = query.order_by(sort_col.desc() if order == 'desc' else sort_col.asc())
+
+    # Page d'ids paginée, objets JSON construits par PostgreSQL (OrderService.orders_json)
+    page, per_page = get_pagination_params()
+    rows, pagination = paginate_page(
+        query.with_entities(Order.id), page, per_page,
+        estimate=True, exact_count=request.args.get('exact_count') == 'true'
+    )
+    items = OrderService.orders_json([row.id for row in rows])
+
+    return json_body_response(
+        b'{"items":' + items.encode() + b',"pagination":' + current_app.json.dumpb(pagination) + b'}'
+    )
 
-    return jsonify(result), 200
+
+@api_v1.route('/orders/stream', methods=['GET'])
+@jwt_required()
+def stream_orders():
+    """
+    Export de toutes les commandes en flux NDJSON.
+    ---
+    tags:
+      - Orders
+    summary: Export des commandes (NDJSON)
+    description: |
+      Retourne toutes les commandes filtrées, une commande JSON complète (avec ses lignes) par ligne,
+      triées par created_at puis id. Lecture par lots de 500 en keyset (sans OFFSET): mémoire constante
+      côté serveur, le client peut interrompre le téléchargement à tout moment.
+      Mêmes filtres que GET /orders.
+    security:
+      - Bearer: []
+    produces:
+      - application/x-ndjson
+    parameters:
+      - name: status
+        in: query
+        type: string
+        enum: [brouillon, confirmee, en_preparation, en_livraison, livree, annulee]
+      - name: search
+        in: query
+        type: string
+      - name: livreur_id
+        in: query
+        type: integer
+    responses:
+      200:
+        description: Une commande JSON par ligne
+      401:
+        description: Non authentifié
+        schema:
+          $ref: '#/definitions/Error'
+    """
+    set_current_user_id(get_jwt_identity())
+
+    query = _filter_orders(Order.query.filter_by(is_deleted=False))
+    key = tuple_(Order.created_at, Order.id)
+
+    def generate():
+        dumpb = current_app.json.dumpb
+        last = None
+        while True:
+            batch_query = query.options(*_order_detail_options())
+            if last is not None:
+                batch_query = batch_query.filter(key > tuple_(*last))
+            orders = batch_query.order_by(Order.created_at, Order.id).limit(ORDERS_STREAM_BATCH_SIZE).all()
+            if not orders:
+                return
+
+            for order in orders:
+                yield dumpb(order.to_dict(include_items=True)) + b'\n'
+
+            last = (orders[-1].created_at, orders[-1].id)
+            if len(orders) < ORDERS_STREAM_BATCH_SIZE:
+                return
+            # Lot envoyé: libérer les objets pour garder une mémoire constante
+            db.session.expunge_all()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 
 @api_v1.route('/orders/<int:order_id>', methods=['GET'])
@@ -234,7 +451,7 @@ def get_order(order_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
+    order = _get_order(order_id)
 
     if not order:
         return jsonify({'error': 'Commande non trouvée'}), 404
@@ -278,7 +495,7 @@ def get_order_by_numero(numero):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(numero=numero, is_deleted=False).first()
+    order = Order.query.options(*_order_detail_options()).filter_by(numero=numero, is_deleted=False).first()
 
     if not order:
         return jsonify({'error': 'Commande non trouvée'}), 404
@@ -360,26 +577,23 @@ def create_order():
     """
     user_id = get_jwt_identity()
     set_current_user_id(user_id)
-    schema = OrderCreateSchema()
 
     try:
-        data = schema.load(request.get_json())
+        data = order_create_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
     try:
-        order = OrderService.create_order(data, user_id=user_id)
-        db.session.commit()
-
-        return jsonify({
-            'message': 'Commande créée avec succès',
-            'order': order.to_dict(include_items=True)
-        }), 201
-
+        with _write_transaction():
+            order = OrderService.create_order(data, user_id=user_id)
     except ValueError as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+    return jsonify({
+        'message': 'Commande créée avec succès',
+        'order': order.to_dict(include_items=True)
+    }), 201
+
 
 @api_v1.route('/orders/<int:order_id>', methods=['PUT'])
 @jwt_required()
@@ -445,30 +659,27 @@ def update_order(order_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
+    order = _get_order(order_id)
 
     if not order:
         return jsonify({'error': 'Commande non trouvée'}), 404
 
-    schema = OrderUpdateSchema()
-
     try:
-        data = schema.load(request.get_json())
+        data = order_update_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
     try:
-        order = OrderService.update_order(order, data)
-        db.session.commit()
-
-        return jsonify({
-            'message': 'Commande mise à jour avec succès',
-            'order': order.to_dict(include_items=True)
-        }), 200
-
+        with _write_transaction():
+            order = OrderService.update_order(order, data)
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+    return jsonify({
+        'message': 'Commande mise à jour avec succès',
+        'order': order.to_dict(include_items=True)
+    }), 200
+
 
 @api_v1.route('/orders/<int:order_id>', methods=['DELETE'])
 @jwt_required()
@@ -516,16 +727,13 @@ def delete_order(order_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
-
-    if not order:
-        return jsonify({'error': 'Commande non trouvée'}), 404
-
-    if order.status not in [OrderStatus.BROUILLON.value, OrderStatus.ANNULEE.value]:
-        return jsonify({'error': 'Seules les commandes en brouillon ou annulées peuvent être supprimées'}), 400
-
-    order.soft_delete()
-    db.session.commit()
+    try:
+        with _write_transaction():
+            OrderService.soft_delete_order(order_id)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     return jsonify({'message': 'Commande supprimée avec succès'}), 200
 
@@ -591,30 +799,27 @@ def add_order_item(order_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
+    order = _get_order(order_id)
 
     if not order:
         return jsonify({'error': 'Commande non trouvée'}), 404
 
-    schema = OrderItemCreateSchema()
-
     try:
-        data = schema.load(request.get_json())
+        data = order_item_create_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
     try:
-        order = OrderService.add_item_to_order(order, data['product_id'], data['quantity'])
-        db.session.commit()
-
-        return jsonify({
-            'message': 'Article ajouté avec succès',
-            'order': order.to_dict(include_items=True)
-        }), 201
-
+        with _write_transaction():
+            order = OrderService.add_item_to_order(order, data['product_id'], data['quantity'])
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+    return jsonify({
+        'message': 'Article ajouté avec succès',
+        'order': order.to_dict(include_items=True)
+    }), 201
+
 
 @api_v1.route('/orders/<int:order_id>/items/<int:item_id>', methods=['PATCH'])
 @jwt_required()
@@ -654,6 +859,11 @@ def update_order_item(order_id, item_id):
               type: integer
               minimum: 1
               description: Nouvelle quantité
+      - name: include
+        in: query
+        type: string
+        enum: [summary]
+        description: "summary: commande résumée (id, numero, status, montant_total, est_paye, livreur_id, updated_at) sans les lignes"
     responses:
       200:
         description: Quantité mise à jour avec succès
@@ -692,34 +902,37 @@ def update_order_item(order_id, item_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
+    order = _get_order(order_id)
     if not order:
         return jsonify({'error': 'Commande non trouvée'}), 404
 
-    if order.status != OrderStatus.BROUILLON.value:
+    if order.status not in _EDITABLE_STATUSES:
         return jsonify({'error': 'Seules les commandes en brouillon peuvent être modifiées'}), 400
 
-    item = OrderItem.query.filter_by(id=item_id, order_id=order_id).first()
+    item = _get_order_item(order, item_id)
     if not item:
         return jsonify({'error': 'Article non trouvé'}), 404
 
-    data = request.get_json() or {}
-    if 'quantity' not in data:
-        return jsonify({'error': 'quantity est requis'}), 400
-
-    quantity = data['quantity']
-    if not isinstance(quantity, int) or quantity < 1:
-        return jsonify({'error': 'quantity doit être un entier >= 1'}), 400
+    try:
+        quantity = order_item_quantity_schema.load(request.get_json() or {})['quantity']
+    except ValidationError as err:
+        return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
-    item.quantity = quantity
-    item.calculate_total()
-    order.calculate_total()
+    # Même quantité (réémission d'une UI optimiste): aucune écriture
+    if item.quantity == quantity:
+        return jsonify({
+            'message': 'Quantité inchangée',
+            'order': _order_payload(order)
+        }), 200
 
-    db.session.commit()
+    with _write_transaction():
+        item.quantity = quantity
+        item.calculate_total()
+        order.calculate_total()
 
     return jsonify({
         'message': 'Quantité mise à jour avec succès',
-        'order': order.to_dict(include_items=True)
+        'order': _order_payload(order)
     }), 200
 
 
@@ -772,23 +985,22 @@ def remove_order_item(order_id, item_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
+    order = _get_order(order_id)
 
     if not order:
         return jsonify({'error': 'Commande non trouvée'}), 404
 
     try:
-        order = OrderService.remove_item_from_order(order, item_id)
-        db.session.commit()
-
-        return jsonify({
-            'message': 'Article supprimé avec succès',
-            'order': order.to_dict(include_items=True)
-        }), 200
-
+        with _write_transaction():
+            order = OrderService.remove_item_from_order(order, item_id)
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+    return jsonify({
+        'message': 'Article supprimé avec succès',
+        'order': order.to_dict(include_items=True)
+    }), 200
+
 
 @api_v1.route('/orders/<int:order_id>/confirm', methods=['POST'])
 @jwt_required()
@@ -835,24 +1047,22 @@ def confirm_order(order_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
+    order = _get_order(order_id)
 
     if not order:
         return jsonify({'error': 'Commande non trouvée'}), 404
 
     try:
-        order = OrderService.confirm_order(order)
-        db.session.commit()
-
-        return jsonify({
-            'message': 'Commande confirmée avec succès',
-            'order': order.to_dict(include_items=True)
-        }), 200
-
+        with _write_transaction():
+            order = OrderService.confirm_order(order)
     except ValueError as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+    return jsonify({
+        'message': 'Commande confirmée avec succès',
+        'order': order.to_dict(include_items=True)
+    }), 200
+
 
 @api_v1.route('/orders/<int:order_id>/status', methods=['PATCH'])
 @jwt_required()
@@ -906,6 +1116,11 @@ def update_order_status(order_id):
               type: string
               enum: [brouillon, confirmee, payee, en_preparation, en_livraison, livree, annulee]
               description: Nouveau statut de la commande
+      - name: include
+        in: query
+        type: string
+        enum: [summary]
+        description: "summary: commande résumée (id, numero, status, montant_total, est_paye, livreur_id, updated_at) sans les lignes"
     responses:
       200:
         description: Statut mis à jour avec succès
@@ -933,31 +1148,27 @@ def update_order_status(order_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
+    order = _get_order(order_id)
 
     if not order:
         return jsonify({'error': 'Commande non trouvée'}), 404
 
-    schema = OrderStatusUpdateSchema()
-
     try:
-        data = schema.load(request.get_json())
+        data = order_status_update_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
     try:
-        order = OrderService.update_status(order, data['status'])
-        db.session.commit()
-
-        return jsonify({
-            'message': f"Statut mis à jour: {order.status}",
-            'order': order.to_dict(include_items=True)
-        }), 200
-
+        with _write_transaction():
+            order = OrderService.update_status(order, data['status'])
     except ValueError as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+    return jsonify({
+        'message': f"Statut mis à jour: {order.status}",
+        'order': _order_payload(order)
+    }), 200
+
 
 @api_v1.route('/orders/<int:order_id>/cancel', methods=['POST'])
 @jwt_required()
@@ -1021,31 +1232,27 @@ def cancel_order(order_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
+    order = _get_order(order_id)
 
     if not order:
         return jsonify({'error': 'Commande non trouvée'}), 404
 
-    schema = OrderCancelSchema()
-
     try:
-        data = schema.load(request.get_json() or {})
+        data = order_cancel_schema.load(request.get_json() or {})
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
     try:
-        order = OrderService.cancel_order(order, data['motif_annulation'])
-        db.session.commit()
-
-        return jsonify({
-            'message': 'Commande annulée avec succès',
-            'order': order.to_dict(include_items=True)
-        }), 200
-
+        with _write_transaction():
+            order = OrderService.cancel_order(order, data['motif_annulation'])
     except ValueError as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+    return jsonify({
+        'message': 'Commande annulée avec succès',
+        'order': order.to_dict(include_items=True)
+    }), 200
+
 
 @api_v1.route('/orders/<int:order_id>/pay', methods=['POST'])
 @jwt_required()
@@ -1096,6 +1303,11 @@ def pay_order(order_id):
             mobile_money_ref:
               type: string
               description: Référence de la transaction (requis si type=mobile_money)
+      - name: include
+        in: query
+        type: string
+        enum: [summary]
+        description: "summary: commande résumée (id, numero, status, montant_total, est_paye, livreur_id, updated_at) sans les lignes"
     responses:
       200:
         description: Paiement enregistré avec succès
@@ -1123,31 +1335,27 @@ def pay_order(order_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
+    order = _get_order(order_id)
 
     if not order:
         return jsonify({'error': 'Commande non trouvée'}), 404
 
-    schema = OrderPaymentSchema()
-
     try:
-        data = schema.load(request.get_json())
+        data = order_payment_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
     try:
-        order = OrderService.pay_order(order, data)
-        db.session.commit()
-
-        return jsonify({
-            'message': 'Paiement enregistré avec succès',
-            'order': order.to_dict(include_items=True)
-        }), 200
-
+        with _write_transaction():
+            order = OrderService.pay_order(order, data)
     except ValueError as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+    return jsonify({
+        'message': 'Paiement enregistré avec succès',
+        'order': _order_payload(order)
+    }), 200
+
 
 @api_v1.route('/orders/<int:order_id>/assign-livreur', methods=['POST'])
 @jwt_required()
@@ -1183,6 +1391,11 @@ def assign_livreur(order_id):
             livreur_id:
               type: integer
               description: ID de l'utilisateur livreur à assigner
+      - name: include
+        in: query
+        type: string
+        enum: [summary]
+        description: "summary: commande résumée (id, numero, status, montant_total, est_paye, livreur_id, updated_at) sans les lignes"
     responses:
       200:
         description: Livreur assigné avec succès
@@ -1226,7 +1439,7 @@ def assign_livreur(order_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
+    order = _get_order(order_id)
 
     if not order:
         return jsonify({'error': 'Commande non trouvée'}), 404
@@ -1236,17 +1449,16 @@ def assign_livreur(order_id):
         return jsonify({'error': 'livreur_id est requis'}), 400
 
     try:
-        order = OrderService.assign_livreur(order, data['livreur_id'])
-        db.session.commit()
-
-        return jsonify({
-            'message': 'Livreur assigné avec succès',
-            'order': order.to_dict(include_items=True)
-        }), 200
-
+        with _write_transaction():
+            order = OrderService.assign_livreur(order, data['livreur_id'])
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+    return jsonify({
+        'message': 'Livreur assigné avec succès',
+        'order': _order_payload(order)
+    }), 200
+
 
 @api_v1.route('/orders/statuses', methods=['GET'])
 @jwt_required()
@@ -1287,7 +1499,7 @@ def get_order_statuses():
               - annulee
     """
     return jsonify({
-        'statuses': [s.value for s in OrderStatus]
+        'statuses': _ORDER_STATUS_LIST
     }), 200
 
 
@@ -1335,22 +1547,8 @@ def get_order_counts():
     """
     set_current_user_id(get_jwt_identity())
 
-    # Initialiser les compteurs à 0 pour chaque statut
-    counts = {status.value: 0 for status in OrderStatus}
-
-    # Compter les commandes par statut
-    status_counts = db.session.query(
-        Order.status,
-        db.func.count(Order.id)
-    ).filter(
-        Order.is_deleted == False
-    ).group_by(
-        Order.status
-    ).all()
-
-    # Mettre à jour les compteurs avec les valeurs de la base
-    for status, count in status_counts:
-        counts[status] = count
+    # Compteurs par statut (mis en cache, invalidés à chaque commit sur une commande)
+    counts = OrderService.get_status_counts()
 
     # Calculer le total
     total = sum(counts.values())
@@ -1427,29 +1625,39 @@ def verify_order_item(order_id, item_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
-    if not order:
-        return jsonify({'error': 'Commande non trouvée'}), 404
-
-    item = OrderItem.query.filter_by(id=item_id, order_id=order_id).first()
-    if not item:
-        return jsonify({'error': 'Article non trouvé'}), 404
-
     data = request.get_json() or {}
 
     if 'verification_status' in data:
         new_status = data['verification_status']
-        if new_status not in [s.value for s in ItemVerificationStatus]:
+        if new_status not in _VERIFICATION_STATUS_VALUES:
             return jsonify({'error': 'Statut de vérification invalide'}), 400
-        item.verification_status = new_status
     else:
-        # Toggle automatique
-        if item.verification_status == ItemVerificationStatus.A_VERIFIER.value:
-            item.verification_status = ItemVerificationStatus.OK.value
-        else:
-            item.verification_status = ItemVerificationStatus.A_VERIFIER.value
+        # Toggle automatique, calculé par la base à partir de la valeur courante
+        new_status = case(
+            (OrderItem.verification_status == ItemVerificationStatus.A_VERIFIER.value, ItemVerificationStatus.OK.value),
+            else_=ItemVerificationStatus.A_VERIFIER.value
+        )
 
-    db.session.commit()
+    # Un seul UPDATE ... RETURNING: ni lecture préalable de la commande ni de la ligne.
+    # L'UPDATE direct ne déclenche pas les listeners d'audit: renseigner les champs ici.
+    active_order = select(Order.id).where(Order.id == order_id, Order.is_deleted.is_(False))
+    with _write_transaction():
+        item = db.session.execute(
+            update(OrderItem)
+            .where(
+                OrderItem.id == item_id,
+                OrderItem.order_id == order_id,
+                active_order.exists()
+            )
+            .values(verification_status=new_status, updated_at=datetime.utcnow(), updated_by=get_current_user_id())
+            .returning(OrderItem)
+        ).scalar_one_or_none()
+
+    if item is None:
+        # Aucune ligne modifiée: préciser laquelle de la commande ou de l'article manque
+        if db.session.scalar(active_order) is None:
+            return jsonify({'error': 'Commande non trouvée'}), 404
+        return jsonify({'error': 'Article non trouvé'}), 404
 
     return jsonify({
         'message': 'Statut de vérification mis à jour',
@@ -1488,6 +1696,11 @@ def verify_all_order_items(order_id):
               type: string
               enum: [a_verifier, ok]
               description: Nouveau statut de vérification
+      - name: include
+        in: query
+        type: string
+        enum: [summary]
+        description: "summary: sans la commande complète (order), seulement le nombre d'articles modifiés"
     responses:
       200:
         description: Statuts de vérification mis à jour
@@ -1497,6 +1710,13 @@ def verify_all_order_items(order_id):
             message:
               type: string
               example: "Tous les articles sont maintenant: ok"
+            order_id:
+              type: integer
+            verification_status:
+              type: string
+            updated_count:
+              type: integer
+              description: Nombre d'articles dont le statut a changé
             order:
               type: object
               description: Commande avec tous ses articles mis à jour
@@ -1512,6 +1732,9 @@ def verify_all_order_items(order_id):
         examples:
           application/json:
             message: "Tous les articles sont maintenant: ok"
+            order_id: 123
+            verification_status: ok
+            updated_count: 2
             order:
               id: 123
               numero: "CMD-20260102-123"
@@ -1531,28 +1754,45 @@ def verify_all_order_items(order_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
-    if not order:
-        return jsonify({'error': 'Commande non trouvée'}), 404
-
     data = request.get_json() or {}
 
     if 'verification_status' not in data:
         return jsonify({'error': 'verification_status est requis'}), 400
 
     new_status = data['verification_status']
-    if new_status not in [s.value for s in ItemVerificationStatus]:
+    if new_status not in _VERIFICATION_STATUS_VALUES:
         return jsonify({'error': 'Statut de vérification invalide'}), 400
 
-    for item in order.items:
-        item.verification_status = new_status
+    # Un seul UPDATE pour toutes les lignes à changer (au lieu d'un UPDATE par article au flush),
+    # sans charger la commande au préalable.
+    # L'UPDATE direct ne déclenche pas les listeners d'audit: renseigner les champs ici.
+    active_order = select(Order.id).where(Order.id == order_id, Order.is_deleted == False)
+    with _write_transaction():
+        updated_count = db.session.execute(
+            update(OrderItem)
+            .where(
+                OrderItem.order_id == order_id,
+                OrderItem.verification_status != new_status,
+                active_order.exists()
+            )
+            .values(verification_status=new_status, updated_at=datetime.utcnow(), updated_by=get_current_user_id())
+            .execution_options(synchronize_session=False)
+        ).rowcount
 
-    db.session.commit()
+    if updated_count == 0 and db.session.scalar(active_order) is None:
+        return jsonify({'error': 'Commande non trouvée'}), 404
 
-    return jsonify({
+    result = {
         'message': f'Tous les articles sont maintenant: {new_status}',
-        'order': order.to_dict(include_items=True)
-    }), 200
+        'order_id': order_id,
+        'verification_status': new_status,
+        'updated_count': updated_count
+    }
+    # Commande complète (lue après l'UPDATE) sauf avec ?include=summary
+    if request.args.get('include') != 'summary':
+        result['order'] = _get_order(order_id).to_dict(include_items=True)
+
+    return jsonify(result), 200
 
 
 @api_v1.route('/orders_minimal_info', methods=['GET'])
@@ -1586,14 +1826,22 @@ def get_orders_minimal_info():
       - name: sort
         in: query
         type: string
+        enum: [created_at, updated_at, numero, status, montant_total, total_amount]
         default: created_at
-        description: Champ de tri
+        description: Champ de tri (created_at si non reconnu)
       - name: order
         in: query
         type: string
         enum: [asc, desc]
         default: desc
         description: Ordre de tri
+      - name: cursor
+        in: query
+        type: string
+        description: |
+          Curseur de pagination (keyset sur la colonne de tri puis id, hors montant_total).
+          Remplace page; vide pour la première page. La réponse contient alors
+          orders, per_page, next_cursor et has_next (sans total).
       - name: page
         in: query
         type: integer
@@ -1602,6 +1850,13 @@ def get_orders_minimal_info():
         in: query
         type: integer
         default: 20
+      - name: exact_count
+        in: query
+        type: boolean
+        default: false
+        description: |
+          Forcer le COUNT(*) exact. Sinon, au-delà de 50 000 lignes estimées,
+          total et pages valent null et total_estimate donne l'estimation PostgreSQL.
     responses:
       200:
         description: Liste paginée des commandes (format minimal)
@@ -1655,50 +1910,55 @@ def get_orders_minimal_info():
     """
     set_current_user_id(get_jwt_identity())
 
-    query = Order.query.filter_by(is_deleted=False)
+    # Livreur sérialisé par to_minimal_dict: un seul SELECT ... IN pour la page (items: selectin par défaut)
+    query = Order.query.options(selectinload(Order.livreur)).filter_by(is_deleted=False)
 
     # Filtres
-    status = request.args.get('status')
-    if status and status in [s.value for s in OrderStatus]:
-        query = query.filter_by(status=status)
-
-    search = request.args.get('search')
-    if search:
-        search_filter = f'%{search}%'
-        query = query.filter(
-            db.or_(
-                Order.numero.ilike(search_filter),
-                Order.client_nom.ilike(search_filter),
-                Order.client_telephone.ilike(search_filter)
-            )
-        )
-
-    livreur_id = request.args.get('livreur_id', type=int)
-    if livreur_id:
-        query = query.filter_by(livreur_id=livreur_id)
+    query = _filter_orders(query)
 
     # Tri
     sort = request.args.get('sort', 'created_at')
     order = request.args.get('order', 'desc')
-    if hasattr(Order, sort):
-        sort_col = getattr(Order, sort)
-        query = query.order_by(sort_col.desc() if order == 'desc' else sort_col.asc())
+
+    # Pagination par curseur (sans COUNT ni OFFSET) si demandée, sinon pagination par page
+    if 'cursor' in request.args:
+        if sort in _SORTABLE_COLS and sort not in _KEYSET_SORTABLE_COLS:
+            return jsonify({'error': f'La pagination par curseur ne supporte pas le tri par {sort}'}), 400
+        sort_col = _KEYSET_SORTABLE_COLS.get(sort, Order.created_at)
+        try:
+            result = keyset_paginate(
+                query, [sort_col, Order.id], None,
+                descending=order == 'desc', serializer=Order.to_minimal_dict
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'orders': result['items'], **result['pagination']}), 200
+
+    sort_col = _SORTABLE_COLS.get(sort, Order.created_at)
+    query = query.order_by(sort_col.desc() if order == 'desc' else sort_col.asc())
 
     # Pagination
     page = request.args.get('page', 1, type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 100)
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    orders, pagination = paginate_page(
+        query, page, per_page,
+        estimate=True, exact_count=request.args.get('exact_count') == 'true'
+    )
 
-    return jsonify({
-        'orders': [order.to_minimal_dict() for order in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
+    result = {
+        'orders': [order.to_minimal_dict() for order in orders],
+        'total': pagination['total'],
+        'pages': pagination['pages'],
         'current_page': page,
         'per_page': per_page,
-        'has_next': pagination.has_next,
-        'has_prev': pagination.has_prev
-    }), 200
+        'has_next': pagination['has_next'],
+        'has_prev': pagination['has_prev']
+    }
+    if 'total_estimate' in pagination:
+        result['total_estimate'] = pagination['total_estimate']
+
+    return jsonify(result), 200
 
 
 @api_v1.route('/orders/history/<int:order_id>', methods=['GET'])
@@ -1759,16 +2019,22 @@ def get_order_history(order_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    order = Order.query.filter_by(id=order_id, is_deleted=False).first()
-    if not order:
+    # Une seule requête: numéro de la commande, événements (jointure externe) et leurs auteurs.
+    # Aucune ligne: commande absente; une ligne sans événement: historique vide.
+    rows = db.session.execute(
+        select(Order.numero, OrderHistory)
+        .outerjoin(OrderHistory, OrderHistory.order_id == Order.id)
+        .where(Order.id == order_id, Order.is_deleted == False)
+        .order_by(OrderHistory.created_at.asc(), OrderHistory.id.asc())
+        .options(joinedload(OrderHistory.user))
+    ).all()
+    if not rows:
         return jsonify({'error': 'Commande non trouvée'}), 404
 
-    history = OrderHistory.query.filter_by(order_id=order_id).order_by(OrderHistory.created_at.asc()).all()
-
     return jsonify({
         'order_id': order_id,
-        'order_number': order.numero,
-        'history': [h.to_dict() for h in history]
+        'order_number': rows[0].numero,
+        'history': [row.OrderHistory.to_dict() for row in rows if row.OrderHistory is not None]
     }), 200
 
 
@@ -1,24 +1,73 @@
 """
 API Products - CRUD Articles/Produits
 """
-from flask import request, jsonify
+from datetime import datetime
+from decimal import Decimal
+
+from flask import request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
+from sqlalchemy import insert, update, select, exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
 from . import api_v1
 from app.extensions import db
 from app.models.product import Product, PriceHistory
 from app.models.stock import Stock
+from app.models.category import Category
 from app.schemas.product import ProductSchema, ProductCreateSchema, ProductUpdateSchema
-from app.core.audit_mixin import set_current_user_id
+from app.core.audit_mixin import set_current_user_id, get_current_user_id
 from app.core.security import role_required, UserRoles
-from app.core.utils import paginate_query
+from app.core.utils import paginate_query, keyset_paginate, search_pattern, json_body_response
+from app.core.cache import TTLCache
 from app.services.stock_service import StockService
+from app.services.dashboard_service import DashboardService
 
 
 # Schemas instances
 product_schema = ProductSchema()
 products_schema = ProductSchema(many=True)
+product_create_schema = ProductCreateSchema()
+product_update_schema = ProductUpdateSchema()
+
+# Détail d'un produit: (product_id, updated_at produit/stock/catégorie) -> corps JSON encodé.
+# Toute écriture fait avancer un updated_at: l'ancienne entrée n'est plus lue (valable entre workers)
+product_cache = TTLCache(ttl=300, maxsize=1024)
+
+# Réponses de l'historique des prix: (product_id, limit, updated_at du produit) -> corps JSON encodé
+price_history_cache = TTLCache(ttl=3600, maxsize=1024)
+PRICE_HISTORY_MAX_LIMIT = 500
+
+# Colonnes de tri autorisées (liste blanche, nom si non reconnu)
+_SORTABLE_COLS = {
+    'nom': Product.nom,
+    'prix': Product.prix,
+    'sku': Product.sku,
+    'created_at': Product.created_at,
+    'updated_at': Product.updated_at
+}
+# Colonnes de tri utilisables avec la pagination par curseur (non nulles, encodables en JSON)
+_KEYSET_SORTABLE_COLS = {
+    'nom': Product.nom,
+    'created_at': Product.created_at,
+    'updated_at': Product.updated_at
+}
+
+
+def _stage_price_changes(changes):
+    """
+    Insère l'historique de plusieurs changements de prix en un seul INSERT (exécution groupée).
+    changes: liste de dicts product_id, ancien_prix, nouveau_prix, motif.
+    L'insertion groupée ne déclenche pas les listeners d'audit: renseigner les champs ici.
+    """
+    if not changes:
+        return
+    user_id = get_current_user_id()
+    db.session.execute(
+        insert(PriceHistory),
+        [{**change, 'created_by': user_id, 'updated_by': user_id} for change in changes]
+    )
 
 
 @api_v1.route('/products', methods=['GET'])
@@ -52,13 +101,20 @@ def get_products():
       - name: sort
         in: query
         type: string
+        enum: [nom, prix, sku, created_at, updated_at]
         default: nom
-        description: Champ de tri
+        description: Champ de tri (nom si non reconnu)
       - name: order
         in: query
         type: string
         enum: [asc, desc]
         default: asc
+      - name: cursor
+        in: query
+        type: string
+        description: |
+          Curseur de pagination (keyset sur nom, created_at ou updated_at puis id).
+          Remplace page; vide pour la première page. Aucun total n'est alors calculé.
       - name: page
         in: query
         type: integer
@@ -84,16 +140,30 @@ def get_products():
     if is_active is not None:
         query = query.filter_by(is_active=is_active.lower() == 'true')
 
-    search = request.args.get('search')
-    if search:
-        query = query.filter(Product.nom.ilike(f'%{search}%'))
+    pattern = search_pattern(request.args.get('search'))
+    if pattern:
+        # Sous-chaîne servie par l'index trigramme ix_products_nom_trgm (migration 018)
+        query = query.filter(Product.nom.ilike(pattern, escape='\\'))
 
     # Tri
     sort = request.args.get('sort', 'nom')
     order = request.args.get('order', 'asc')
-    if hasattr(Product, sort):
-        sort_col = getattr(Product, sort)
-        query = query.order_by(sort_col.desc() if order == 'desc' else sort_col.asc())
+
+    # Pagination par curseur (sans COUNT ni OFFSET) si demandée, sinon pagination par page
+    if 'cursor' in request.args:
+        if sort in _SORTABLE_COLS and sort not in _KEYSET_SORTABLE_COLS:
+            return jsonify({'error': f'La pagination par curseur ne supporte pas le tri par {sort}'}), 400
+        sort_col = _KEYSET_SORTABLE_COLS.get(sort, Product.nom)
+        try:
+            result = keyset_paginate(
+                query, [sort_col, Product.id], products_schema, descending=order == 'desc'
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(result), 200
+
+    sort_col = _SORTABLE_COLS.get(sort, Product.nom)
+    query = query.order_by(sort_col.desc() if order == 'desc' else sort_col.asc())
 
     result = paginate_query(query, products_schema)
 
@@ -128,12 +198,28 @@ def get_product(product_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    product = Product.query.filter_by(id=product_id, is_deleted=False).first()
+    # Version du payload: updated_at du produit, de son stock et de sa catégorie
+    # (lecture par clé primaire, sans charger d'objets)
+    version = db.session.query(Product.updated_at, Stock.updated_at, Category.updated_at)\
+        .outerjoin(Stock, Stock.product_id == Product.id)\
+        .outerjoin(Category, Category.id == Product.category_id)\
+        .filter(Product.id == product_id, Product.is_deleted == False)\
+        .first()
 
-    if not product:
+    if version is None:
         return jsonify({'error': 'Produit non trouvé'}), 404
 
-    return jsonify({'product': product.to_dict()}), 200
+    key = (product_id, *version)
+    body = product_cache.get(key)
+
+    if body is None:
+        product = Product.query.options(joinedload(Product.category)).filter_by(id=product_id, is_deleted=False).first()
+        if not product:
+            return jsonify({'error': 'Produit non trouvé'}), 404
+        body = current_app.json.dumps({'product': product.to_dict()}).encode('utf-8')
+        product_cache.set(key, body)
+
+    return json_body_response(body)
 
 
 @api_v1.route('/products', methods=['POST'])
@@ -187,10 +273,9 @@ def create_product():
         description: Données invalides
     """
     set_current_user_id(get_jwt_identity())
-    schema = ProductCreateSchema()
 
     try:
-        data = schema.load(request.get_json())
+        data = product_create_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
@@ -205,21 +290,26 @@ def create_product():
         category_id=data['category_id']
     )
 
-    db.session.add(product)
-    db.session.flush()
+    # L'index unique partiel garantit l'unicité du SKU en cas de requêtes concurrentes
+    try:
+        db.session.add(product)
+        db.session.flush()
 
-    # Créer le stock initial
-    stock_initial = data.get('stock_initial', 0)
-    seuil_alerte = data.get('seuil_alerte', 10)
+        # Créer le stock initial
+        stock_initial = data.get('stock_initial', 0)
+        seuil_alerte = data.get('seuil_alerte', 10)
 
-    stock = Stock(
-        product_id=product.id,
-        quantity=stock_initial,
-        seuil_alerte=seuil_alerte
-    )
-    db.session.add(stock)
+        stock = Stock(
+            product_id=product.id,
+            quantity=stock_initial,
+            seuil_alerte=seuil_alerte
+        )
+        db.session.add(stock)
 
-    db.session.commit()
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Ce SKU est déjà utilisé'}), 400
 
     return jsonify({
         'message': 'Produit créé avec succès',
@@ -287,47 +377,68 @@ def update_product(product_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    product = Product.query.filter_by(id=product_id, is_deleted=False).first()
+    # Catégorie chargée avec le produit: la réponse (to_dict) ne relit rien après le commit
+    product = Product.query.options(joinedload(Product.category)).filter_by(id=product_id, is_deleted=False).first()
 
     if not product:
         return jsonify({'error': 'Produit non trouvé'}), 404
 
-    schema = ProductUpdateSchema()
-
     try:
-        data = schema.load(request.get_json())
+        data = product_update_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
     # Vérifier le SKU s'il est modifié
-    if 'sku' in data and data['sku'] != product.sku:
-        existing = Product.query.filter_by(sku=data['sku'], is_deleted=False).first()
-        if existing:
+    if 'sku' in data and data['sku'] is not None and data['sku'] != product.sku:
+        sku = data['sku']
+        sku_taken = db.session.execute(select(exists().where(
+            Product.sku == sku,
+            Product.is_deleted == False,
+            Product.id != product_id
+        ))).scalar()
+        if sku_taken:
             return jsonify({'error': 'Ce SKU est déjà utilisé'}), 400
 
     # Vérifier la catégorie
     if 'category_id' in data:
-        from app.models.category import Category
         category = Category.query.filter_by(id=data['category_id'], is_deleted=False).first()
         if not category:
             return jsonify({'error': 'Catégorie non trouvée'}), 400
 
+    # Prix comparé en Decimal (comme la colonne): un float ne donne pas de faux changement
+    if 'prix' in data:
+        data['prix'] = Decimal(str(data['prix']))
+
     # Enregistrer l'historique des prix si le prix change
-    if 'prix' in data and data['prix'] != float(product.prix):
-        price_history = PriceHistory(
-            product_id=product.id,
-            ancien_prix=product.prix,
-            nouveau_prix=data['prix'],
-            motif=data.get('motif_changement_prix')
-        )
-        db.session.add(price_history)
+    if 'prix' in data and data['prix'] != product.prix:
+        _stage_price_changes([{
+            'product_id': product.id,
+            'ancien_prix': product.prix,
+            'nouveau_prix': data['prix'],
+            'motif': data.get('motif_changement_prix')
+        }])
 
     # Mettre à jour les champs
     for field in ['nom', 'description', 'prix', 'photo_url', 'sku', 'is_active', 'category_id']:
         if field in data:
             setattr(product, field, data[field])
+    if 'category_id' in data:
+        # Relation déjà chargée: la synchroniser avec la nouvelle catégorie (session sans expiration)
+        product.category = category
 
-    db.session.commit()
+    # Valeurs identiques: ni UPDATE ni COMMIT
+    if not db.session.is_modified(product) and not db.session.new:
+        return jsonify({
+            'message': 'Aucun changement',
+            'product': product.to_dict()
+        }), 200
+
+    # L'index unique partiel garantit l'unicité du SKU en cas de requêtes concurrentes
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Ce SKU est déjà utilisé'}), 400
 
     return jsonify({
         'message': 'Produit mis à jour avec succès',
@@ -368,12 +479,23 @@ def delete_product(product_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    product = Product.query.filter_by(id=product_id, is_deleted=False).first()
-
-    if not product:
+    # Un seul UPDATE ... RETURNING, sans charger le produit.
+    # L'UPDATE direct ne déclenche pas les listeners d'audit: renseigner les champs ici
+    now = datetime.utcnow()
+    user_id = get_current_user_id()
+    deleted_id = db.session.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.is_deleted == False)
+        .values(is_deleted=True, deleted_at=now, deleted_by=user_id, updated_at=now, updated_by=user_id)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+
+    if deleted_id is None:
         return jsonify({'error': 'Produit non trouvé'}), 404
 
-    product.soft_delete()
+    # Pas d'objet Product dans la session: signaler le changement au cache de l'état des stocks
+    DashboardService.mark_etat_stocks_dirty(db.session)
     db.session.commit()
 
     return jsonify({'message': 'Produit supprimé avec succès'}), 200
@@ -412,12 +534,19 @@ def toggle_product_status(product_id):
     """
     set_current_user_id(get_jwt_identity())
 
-    product = Product.query.filter_by(id=product_id, is_deleted=False).first()
+    # Bascule calculée par la base: un seul UPDATE ... RETURNING au lieu de SELECT puis UPDATE.
+    # L'UPDATE direct ne déclenche pas les listeners d'audit: renseigner les champs ici
+    product = db.session.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.is_deleted == False)
+        .values(is_active=~Product.is_active, updated_at=datetime.utcnow(), updated_by=get_current_user_id())
+        .returning(Product)
+    ).scalar_one_or_none()
 
-    if not product:
+    if product is None:
         return jsonify({'error': 'Produit non trouvé'}), 404
 
-    product.is_active = not product.is_active
+    DashboardService.mark_etat_stocks_dirty(db.session)
     db.session.commit()
 
     return jsonify({
@@ -451,10 +580,10 @@ def get_product_price_history(product_id):
         in: query
         type: integer
         default: 50
-        description: Nombre maximum d'entrées à retourner
+        description: Nombre maximum d'entrées à retourner (500 au plus)
     responses:
       200:
-        description: Historique des prix
+        description: Historique des prix (count = entrées retournées, has_more = entrées plus anciennes disponibles)
       404:
         description: Produit non trouvé
     """
@@ -465,17 +594,50 @@ def get_product_price_history(product_id):
     if not product:
         return jsonify({'error': 'Produit non trouvé'}), 404
 
-    limit = request.args.get('limit', 50, type=int)
-
-    history = PriceHistory.query.filter_by(product_id=product_id)\
-        .order_by(PriceHistory.date_changement.desc())\
-        .limit(limit)\
-        .all()
-
-    return jsonify({
-        'product_id': product_id,
-        'product_nom': product.nom,
-        'prix_actuel': float(product.prix),
-        'history': [h.to_dict() for h in history],
-        'count': len(history)
-    }), 200
+    limit = min(max(request.args.get('limit', 50, type=int), 1), PRICE_HISTORY_MAX_LIMIT)
+
+    # Clé incluant updated_at: un changement de prix fait avancer updated_at du produit,
+    # l'ancienne entrée n'est plus jamais lue (valable aussi entre workers)
+    key = (product_id, limit, product.updated_at)
+    body = price_history_cache.get(key)
+
+    if body is None:
+        # Colonnes seules (Row), sans objets ORM: même contenu que PriceHistory.to_dict()
+        history = db.session.query(
+            PriceHistory.id,
+            PriceHistory.ancien_prix,
+            PriceHistory.nouveau_prix,
+            PriceHistory.date_changement,
+            PriceHistory.motif,
+            PriceHistory.created_by
+        ).filter_by(product_id=product_id)\
+            .order_by(PriceHistory.date_changement.desc())\
+            .limit(limit + 1)\
+            .all()
+
+        # Une ligne de plus que demandé: indique s'il reste des entrées, sans COUNT(*)
+        has_more = len(history) > limit
+        history = history[:limit]
+
+        body = current_app.json.dumps({
+            'product_id': product_id,
+            'product_nom': product.nom,
+            'prix_actuel': float(product.prix),
+            'history': [
+                {
+                    'id': h.id,
+                    'product_id': product_id,
+                    'ancien_prix': float(h.ancien_prix) if h.ancien_prix else 0,
+                    'nouveau_prix': float(h.nouveau_prix) if h.nouveau_prix else 0,
+                    'date_changement': h.date_changement.isoformat() if h.date_changement else None,
+                    'motif': h.motif,
+                    'created_by': h.created_by
+                }
+                for h in history
+            ],
+            'count': len(history),
+            'has_more': has_more
+        }).encode('utf-8')
+        price_history_cache.set(key, body)
+
+    return json_body_response(body)
@@ -12,7 +12,7 @@ from app.models.product import Product
 from app.schemas.stock import StockSchema, StockMovementSchema, StockMovementCreateSchema, StockUpdateSchema
 from app.core.audit_mixin import set_current_user_id
 from app.core.security import role_required, UserRoles
-from app.core.utils import paginate_query
+from app.core.utils import paginate_query, paginate_page, keyset_paginate, get_pagination_params, search_pattern
 from app.services.stock_service import StockService
 
 
@@ -21,6 +21,34 @@ stock_schema = StockSchema()
 stocks_schema = StockSchema(many=True)
 movement_schema = StockMovementSchema()
 movements_schema = StockMovementSchema(many=True)
+stock_update_schema = StockUpdateSchema()
+movement_create_schema = StockMovementCreateSchema()
+
+# Types de mouvement valides (filtre), calculés une seule fois
+_MOVEMENT_TYPE_VALUES = frozenset(mt.value for mt in MovementType)
+
+# Valeurs acceptées comme vraies pour les filtres booléens de la query string
+_TRUTHY = frozenset(('1', 'true', 'yes', 'on'))
+
+
+def _as_bool(value):
+    return value.lower() in _TRUTHY
+
+
+def _stock_row_payload(row):
+    """Ligne de la liste des stocks (colonnes seules): même contenu que Stock.to_dict() + produit"""
+    return {
+        'id': row.id,
+        'product_id': row.product_id,
+        'quantity': row.quantity,
+        'seuil_alerte': row.seuil_alerte,
+        'is_low_stock': row.quantity <= row.seuil_alerte,
+        'is_out_of_stock': row.quantity <= 0,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'updated_at': row.updated_at.isoformat() if row.updated_at else None,
+        'product_nom': row.product_nom,
+        'product_sku': row.product_sku
+    }
 
 
 @api_v1.route('/stocks', methods=['GET'])
@@ -51,6 +79,10 @@ def get_stocks():
         in: query
         type: string
         description: Recherche par nom de produit
+      - name: cursor
+        in: query
+        type: string
+        description: Curseur de pagination (keyset sur id). Remplace page; vide pour la première page, aucun total n'est alors calculé.
       - name: page
         in: query
         type: integer
@@ -65,49 +97,52 @@ def get_stocks():
     """
     set_current_user_id(get_jwt_identity())
 
-    query = db.session.query(Stock, Product).join(
+    # Colonnes seules: ni objets ORM ni eager loading (Product.stock est lazy='joined')
+    query = db.session.query(
+        Stock.id,
+        Stock.product_id,
+        Stock.quantity,
+        Stock.seuil_alerte,
+        Stock.created_at,
+        Stock.updated_at,
+        Product.nom.label('product_nom'),
+        Product.sku.label('product_sku')
+    ).join(
         Product, Product.id == Stock.product_id
     ).filter(
         Product.is_deleted == False
     )
 
     # Filtres
-    low_stock = request.args.get('low_stock')
-    if low_stock and low_stock.lower() == 'true':
+    if request.args.get('low_stock', False, type=_as_bool):
         query = query.filter(Stock.quantity <= Stock.seuil_alerte, Stock.quantity > 0)
 
-    out_of_stock = request.args.get('out_of_stock')
-    if out_of_stock and out_of_stock.lower() == 'true':
+    if request.args.get('out_of_stock', False, type=_as_bool):
         query = query.filter(Stock.quantity <= 0)
 
-    search = request.args.get('search')
-    if search:
-        query = query.filter(Product.nom.ilike(f'%{search}%'))
-
-    # Pagination manuelle
-    from app.core.utils import get_pagination_params
+    pattern = search_pattern(request.args.get('search'))
+    if pattern:
+        query = query.filter(Product.nom.ilike(pattern, escape='\\'))
+
+    # Pagination par curseur (sans COUNT ni OFFSET) si demandée, sinon pagination par page
+    if 'cursor' in request.args:
+        try:
+            result = keyset_paginate(
+                query, [Stock.id], None,
+                key_getter=lambda row: [row.id], serializer=_stock_row_payload
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(result), 200
+
+    query = query.order_by(Stock.id.asc())
     page, per_page = get_pagination_params()
-
-    total = query.count()
-    items = query.offset((page - 1) * per_page).limit(per_page).all()
-
-    stocks_data = []
-    for stock, product in items:
-        data = stock.to_dict()
-        data['product_nom'] = product.nom
-        data['product_sku'] = product.sku
-        stocks_data.append(data)
+    # Total lu sur les lignes de la page (COUNT(*) OVER ()): pas de requête de comptage séparée
+    rows, pagination = paginate_page(query, page, per_page, window_count=True)
 
     return jsonify({
-        'items': stocks_data,
-        'pagination': {
-            'page': page,
-            'per_page': per_page,
-            'total': total,
-            'pages': (total + per_page - 1) // per_page,
-            'has_next': page * per_page < total,
-            'has_prev': page > 1
-        }
+        'items': [_stock_row_payload(row) for row in rows],
+        'pagination': pagination
     }), 200
 
 
@@ -202,10 +237,8 @@ def update_stock_settings(product_id):
     if not stock:
         return jsonify({'error': 'Stock non trouvé'}), 404
 
-    schema = StockUpdateSchema()
-
     try:
-        data = schema.load(request.get_json())
+        data = stock_update_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
@@ -220,6 +253,17 @@ def update_stock_settings(product_id):
     }), 200
 
 
+def _movements_keyset_response(query):
+    """Page de mouvements par curseur, du plus récent au plus ancien (created_at, id)"""
+    try:
+        result = keyset_paginate(
+            query, [StockMovement.created_at, StockMovement.id], movements_schema, descending=True
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result), 200
+
+
 @api_v1.route('/stocks/movements', methods=['GET'])
 @jwt_required()
 def get_movements():
@@ -246,6 +290,10 @@ def get_movements():
         type: string
         enum: [entree, sortie, ajustement]
         description: Filtrer par type de mouvement
+      - name: cursor
+        in: query
+        type: string
+        description: Curseur de pagination (keyset sur created_at, id décroissants). Remplace page; vide pour la première page, aucun total n'est alors calculé.
       - name: page
         in: query
         type: integer
@@ -268,9 +316,13 @@ def get_movements():
         query = query.filter_by(product_id=product_id)
 
     movement_type = request.args.get('type')
-    if movement_type and movement_type in [mt.value for mt in MovementType]:
+    if movement_type and movement_type in _MOVEMENT_TYPE_VALUES:
         query = query.filter_by(movement_type=movement_type)
 
+    # Pagination par curseur (sans COUNT ni OFFSET) si demandée
+    if 'cursor' in request.args:
+        return _movements_keyset_response(query)
+
     # Tri par date décroissante
     query = query.order_by(StockMovement.created_at.desc())
 
@@ -301,6 +353,10 @@ def get_product_movements(product_id):
         type: integer
         required: true
         description: ID du produit
+      - name: cursor
+        in: query
+        type: string
+        description: Curseur de pagination (keyset sur created_at, id décroissants). Remplace page; vide pour la première page, aucun total n'est alors calculé.
       - name: page
         in: query
         type: integer
@@ -321,9 +377,13 @@ def get_product_movements(product_id):
     if not product:
         return jsonify({'error': 'Produit non trouvé'}), 404
 
-    query = StockMovement.query.filter_by(product_id=product_id).order_by(
-        StockMovement.created_at.desc()
-    )
+    query = StockMovement.query.filter_by(product_id=product_id)
+
+    # Pagination par curseur (sans COUNT ni OFFSET) si demandée
+    if 'cursor' in request.args:
+        return _movements_keyset_response(query)
+
+    query = query.order_by(StockMovement.created_at.desc())
 
     result = paginate_query(query, movements_schema)
 
@@ -386,10 +446,9 @@ def create_movement():
         description: Produit non trouvé
     """
     set_current_user_id(get_jwt_identity())
-    schema = StockMovementCreateSchema()
 
     try:
-        data = schema.load(request.get_json())
+        data = movement_create_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
@@ -599,25 +658,25 @@ def get_stock_alerts():
     """
     set_current_user_id(get_jwt_identity())
 
-    low_stocks = StockService.get_low_stock_products()
-    out_of_stock = StockService.get_out_of_stock_products()
+    # Une seule requête pour les deux listes, réparties ici
+    alerts = StockService.get_stock_alerts()
 
     return jsonify({
         'low_stock': [
             {
-                'product_id': p.id,
-                'product_nom': p.nom,
-                'quantity': s.quantity,
-                'seuil_alerte': s.seuil_alerte
+                'product_id': a.product_id,
+                'product_nom': a.product_nom,
+                'quantity': a.quantity,
+                'seuil_alerte': a.seuil_alerte
             }
-            for p, s in low_stocks if s.quantity > 0
+            for a in alerts if a.quantity > 0
         ],
         'out_of_stock': [
             {
-                'product_id': p.id,
-                'product_nom': p.nom,
-                'quantity': s.quantity
+                'product_id': a.product_id,
+                'product_nom': a.product_nom,
+                'quantity': a.quantity
             }
-            for p, s in out_of_stock
+            for a in alerts if a.quantity <= 0
         ]
     }), 200
@@ -1,6 +1,8 @@
 """
 API Uploads - Gestion des fichiers uploadés (images)
 """
+from concurrent.futures import ThreadPoolExecutor
+
 from flask import request, jsonify, current_app, send_from_directory
 from flask_jwt_extended import jwt_required
 from werkzeug.exceptions import RequestEntityTooLarge
@@ -10,6 +12,28 @@ from app.services.upload_service import UploadService
 from app.core.security import role_required, UserRoles
 
 
+# Dossiers d'upload acceptés
+_UPLOAD_TYPES = frozenset({'products', 'categories'})
+
+# Images traitées en parallèle par /uploads/images/multiple
+# (écritures disque et redimensionnement Pillow, qui relâche le GIL)
+UPLOAD_WORKERS = 4
+
+
+def _save_upload(app, file, upload_type):
+    """
+    Enregistre une image dans un thread de travail (contexte applicatif propre).
+    Retourne (résultat, None) ou (None, erreur) pour conserver le détail par fichier.
+    """
+    with app.app_context():
+        try:
+            return UploadService.save_image(file, subfolder=upload_type), None
+        except ValueError as e:
+            return None, {'filename': file.filename, 'error': str(e)}
+        except Exception:
+            return None, {'filename': file.filename, 'error': "Erreur lors de l'upload"}
+
+
 @api_v1.route('/uploads/images', methods=['POST'])
 @jwt_required()
 @role_required(UserRoles.ADMIN, UserRoles.CONTROLEUR)
@@ -89,7 +113,7 @@ def upload_image():
 
     # Récupérer le type (products ou categories)
     upload_type = request.form.get('type', 'products')
-    if upload_type not in ['products', 'categories']:
+    if upload_type not in _UPLOAD_TYPES:
         upload_type = 'products'
 
     try:
@@ -175,29 +199,18 @@ def upload_multiple_images():
         }), 400
 
     upload_type = request.form.get('type', 'products')
-    if upload_type not in ['products', 'categories']:
+    if upload_type not in _UPLOAD_TYPES:
         upload_type = 'products'
 
-    results = []
-    errors = []
+    files = [file for file in files if file.filename != '']
+    app = current_app._get_current_object()
 
-    for file in files:
-        if file.filename == '':
-            continue
+    # Ordre des résultats identique à celui des fichiers envoyés
+    with ThreadPoolExecutor(max_workers=max(1, min(len(files), UPLOAD_WORKERS))) as executor:
+        outcomes = list(executor.map(lambda file: _save_upload(app, file, upload_type), files))
 
-        try:
-            result = UploadService.save_image(file, subfolder=upload_type)
-            results.append(result)
-        except ValueError as e:
-            errors.append({
-                'filename': file.filename,
-                'error': str(e)
-            })
-        except Exception as e:
-            errors.append({
-                'filename': file.filename,
-                'error': "Erreur lors de l'upload"
-            })
+    results = [result for result, error in outcomes if error is None]
+    errors = [error for result, error in outcomes if error is not None]
 
     return jsonify({
         'success': len(results) > 0,
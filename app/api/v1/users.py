@@ -10,13 +10,15 @@ from app.extensions import db
 from app.models.user import User
 from app.schemas.user import UserSchema, UserCreateSchema, UserUpdateSchema
 from app.core.audit_mixin import set_current_user_id
-from app.core.security import role_required, UserRoles
-from app.core.utils import paginate_query
+from app.core.security import role_required, UserRoles, invalidate_token_version
+from app.core.utils import paginate_query, search_pattern
 
 
 # Schemas instances
 user_schema = UserSchema()
 users_schema = UserSchema(many=True)
+user_create_schema = UserCreateSchema()
+user_update_schema = UserUpdateSchema()
 
 
 @api_v1.route('/users', methods=['GET'])
@@ -77,14 +79,13 @@ def get_users():
     if is_active is not None:
         query = query.filter_by(is_active=is_active.lower() == 'true')
 
-    search = request.args.get('search')
-    if search:
-        search_filter = f'%{search}%'
+    pattern = search_pattern(request.args.get('search'))
+    if pattern:
         query = query.filter(
             db.or_(
-                User.nom.ilike(search_filter),
-                User.prenom.ilike(search_filter),
-                User.email.ilike(search_filter)
+                User.nom.ilike(pattern, escape='\\'),
+                User.prenom.ilike(pattern, escape='\\'),
+                User.email.ilike(pattern, escape='\\')
             )
         )
 
@@ -189,10 +190,9 @@ def create_user():
         description: Données invalides
     """
     set_current_user_id(get_jwt_identity())
-    schema = UserCreateSchema()
 
     try:
-        data = schema.load(request.get_json())
+        data = user_create_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
@@ -280,19 +280,28 @@ def update_user(user_id):
     if not user:
         return jsonify({'error': 'Utilisateur non trouvé'}), 404
 
-    schema = UserUpdateSchema()
-
     try:
-        data = schema.load(request.get_json())
+        data = user_update_schema.load(request.get_json())
     except ValidationError as err:
         return jsonify({'error': 'Données invalides', 'details': err.messages}), 400
 
     # Vérifier l'email s'il est modifié
-    if 'email' in data and data['email'] != user.email:
-        existing = User.query.filter_by(email=data['email'], is_deleted=False).first()
+    if 'email' in data and data['email'].lower() != user.email.lower():
+        existing = User.query.filter(
+            db.func.lower(User.email) == data['email'].lower(),
+            User.is_deleted == False
+        ).first()
         if existing:
             return jsonify({'error': 'Cet email est déjà utilisé'}), 400
 
+    # Désactivation, changement de rôle ou d'identité (claims email / nom reconduits
+    # par /auth/refresh): les tokens émis ne sont plus valides
+    revoke = (
+        ('role' in data and data['role'] != user.role)
+        or ('is_active' in data and user.is_active and not data['is_active'])
+        or any(field in data and data[field] != getattr(user, field) for field in ('email', 'nom', 'prenom'))
+    )
+
     # Mettre à jour les champs
     for field in ['email', 'nom', 'prenom', 'telephone', 'role', 'is_active']:
         if field in data:
@@ -302,8 +311,14 @@ def update_user(user_id):
     if 'password' in data:
         user.set_password(data['password'])
 
+    if revoke:
+        user.revoke_tokens()
+
     db.session.commit()
 
+    if revoke:
+        invalidate_token_version(user.id)
+
     return jsonify({
         'message': 'Utilisateur mis à jour avec succès',
         'user': user_schema.dump(user)
@@ -355,7 +370,9 @@ def delete_user(user_id):
         return jsonify({'error': 'Utilisateur non trouvé'}), 404
 
     user.soft_delete()
+    user.revoke_tokens()
     db.session.commit()
+    invalidate_token_version(user.id)
 
     return jsonify({'message': 'Utilisateur supprimé avec succès'}), 200
 
@@ -406,7 +423,10 @@ def toggle_user_status(user_id):
         return jsonify({'error': 'Utilisateur non trouvé'}), 404
 
     user.is_active = not user.is_active
+    if not user.is_active:
+        user.revoke_tokens()
     db.session.commit()
+    invalidate_token_version(user.id)
 
     return jsonify({
         'message': f"Utilisateur {'activé' if user.is_active else 'désactivé'}",
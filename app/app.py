@@ -3,12 +3,14 @@ Application Flask - Factory Pattern
 """
 import os
 from flask import Flask, jsonify
-from flask_jwt_extended import get_jwt_identity
 from flasgger import Swagger
 
 from app.config import config
-from app.extensions import db, migrate, jwt, cors, ma
-from app.core.audit_mixin import set_current_user_id
+from app.extensions import db, migrate, jwt, cors, ma, compress
+from app.core.audit_mixin import reset_current_user_id
+from app.core.compression import compress_stream
+from app.core.query_counter import init_query_counter
+from app.core.json_provider import OrjsonProvider
 
 
 # Configuration Swagger
@@ -147,17 +149,25 @@ def create_app(config_name=None):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
 
+    # Sérialisation JSON via orjson
+    app.json = OrjsonProvider(app)
+
     # Initialiser les extensions
     register_extensions(app)
 
+    # Ouvrir les connexions du pool avant la première requête
+    prewarm_db_pool(app)
+
     # Initialiser Swagger
-    Swagger(app, config=SWAGGER_CONFIG, template=SWAGGER_TEMPLATE)
+    swagger = Swagger(app, config=SWAGGER_CONFIG, template=SWAGGER_TEMPLATE)
 
     # Enregistrer les blueprints
     register_blueprints(app)
+    prebuild_apispec(app, swagger)
 
     # Enregistrer les callbacks JWT
     register_jwt_callbacks(app)
+    check_jwt_backend(app)
 
     # Enregistrer les error handlers
     register_error_handlers(app)
@@ -165,6 +175,9 @@ def create_app(config_name=None):
     # Enregistrer les hooks
     register_hooks(app)
 
+    # Enregistrer les commandes CLI
+    register_commands(app)
+
     return app
 
 
@@ -176,6 +189,7 @@ def register_extensions(app):
     migrate.init_app(app, db)
     jwt.init_app(app)
     ma.init_app(app)
+    compress.init_app(app)
 
     # CORS avec les origines configurées
     cors.init_app(app, resources={
@@ -188,6 +202,27 @@ def register_extensions(app):
     })
 
 
+def prewarm_db_pool(app):
+    """
+    Ouvre SQLALCHEMY_POOL_PREWARM connexions puis les rend au pool: les
+    premières requêtes du dashboard ne paient pas l'établissement TCP/auth.
+    """
+    count = min(app.config.get('SQLALCHEMY_POOL_PREWARM', 0), app.config['SQLALCHEMY_ENGINE_OPTIONS'].get('pool_size', 0))
+    if count <= 0:
+        return
+
+    with app.app_context():
+        connections = []
+        try:
+            for _ in range(count):
+                connections.append(db.engine.connect())
+        except Exception as e:
+            app.logger.warning('Préchauffage du pool interrompu: %s', e)
+        finally:
+            for connection in connections:
+                connection.close()
+
+
 def register_blueprints(app):
     """
     Enregistre les blueprints de l'API.
@@ -230,6 +265,23 @@ def register_blueprints(app):
         return send_from_directory(upload_folder, filename)
 
 
+def prebuild_apispec(app, swagger):
+    """
+    Construit la spec OpenAPI (parsing YAML des docstrings) au démarrage.
+    Hors debug, flasgger la garde en cache: /apispec.json ne reparse plus rien.
+    Les routes de l'API ne lisent jamais leur docstring.
+    """
+    if app.debug or app.testing:
+        return
+
+    try:
+        with app.test_request_context():
+            for spec in SWAGGER_CONFIG['specs']:
+                swagger.get_apispecs(spec['endpoint'])
+    except Exception as e:
+        app.logger.warning('Spec OpenAPI non pré-construite: %s', e)
+
+
 def register_jwt_callbacks(app):
     """
     Enregistre les callbacks JWT pour la gestion des tokens.
@@ -263,6 +315,31 @@ def register_jwt_callbacks(app):
         }), 401
 
 
+def check_jwt_backend(app):
+    """
+    Vérifie au démarrage que la signature JWT passe par les bindings natifs
+    (hashlib/OpenSSL pour HS*, cryptography pour RS*/ES*/EdDSA).
+    """
+    import hashlib
+    import ssl
+
+    algorithm = app.config.get('JWT_ALGORITHM', 'HS256')
+
+    if algorithm.startswith('HS'):
+        if 'sha256' not in hashlib.algorithms_available:
+            raise RuntimeError('hashlib sans sha256: OpenSSL requis pour la signature JWT')
+    else:
+        try:
+            import cryptography  # noqa: F401
+        except ImportError:
+            raise RuntimeError(f'JWT_ALGORITHM={algorithm} requiert le paquet cryptography (PyJWT[crypto])')
+
+        if not app.config.get('JWT_PRIVATE_KEY') or not app.config.get('JWT_PUBLIC_KEY'):
+            raise RuntimeError(f'JWT_ALGORITHM={algorithm} requiert JWT_PRIVATE_KEY et JWT_PUBLIC_KEY')
+
+    app.logger.debug('Signature JWT %s via %s', algorithm, ssl.OPENSSL_VERSION)
+
+
 def register_error_handlers(app):
     """
     Enregistre les gestionnaires d'erreurs globaux.
@@ -300,32 +377,11 @@ def register_error_handlers(app):
 def register_hooks(app):
     """
     Enregistre les hooks de requête.
+    Le JWT est vérifié une seule fois par requête, par @jwt_required() sur
+    chaque route protégée (qui renseigne ensuite l'utilisateur d'audit).
     """
-    @app.before_request
-    def before_request():
-        # Importer ici pour éviter les imports circulaires
-        from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-        from flask import request
-
-        # Ne pas vérifier JWT pour certaines routes
-        public_routes = ['/', '/health', '/api/v1/auth/login', '/api/v1/auth/refresh']
-        public_prefixes = ['/apidocs', '/apispec', '/flasgger_static', '/uploads']
-
-        if request.path in public_routes or request.method == 'OPTIONS':
-            return
-
-        # Routes Swagger publiques
-        if any(request.path.startswith(prefix) for prefix in public_prefixes):
-            return
-
-        # Pour les autres routes, essayer de charger l'utilisateur
-        try:
-            verify_jwt_in_request(optional=True)
-            user_id = get_jwt_identity()
-            if user_id:
-                set_current_user_id(user_id)
-        except Exception:
-            pass
+    # Le contexte (thread) est réutilisé d'une requête à l'autre: vider l'utilisateur d'audit
+    app.teardown_appcontext(reset_current_user_id)
 
     @app.after_request
     def after_request(response):
@@ -335,6 +391,23 @@ def register_hooks(app):
         response.headers['X-XSS-Protection'] = '1; mode=block'
         return response
 
+    # Réponses en flux (ex: /dashboard/commandes-details): gzip morceau par morceau
+    app.after_request(compress_stream)
+
+    # Nombre de requêtes SQL par réponse (X-Query-Count), si SQL_QUERY_COUNT_WARN > 0
+    init_query_counter(app)
+
+
+def register_commands(app):
+    """
+    Enregistre les commandes CLI (flask <commande>).
+    """
+    @app.cli.command('refresh-dashboard-views')
+    def refresh_dashboard_views():
+        """Rafraîchit les vues matérialisées du dashboard (à planifier chaque nuit)"""
+        from app.services.dashboard_service import DashboardService
+        DashboardService.refresh_materialized_views()
+
 
 # Point d'entrée pour le développement
 if __name__ == '__main__':
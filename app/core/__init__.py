@@ -3,11 +3,17 @@ Core module - Utilitaires et mixins
 """
 from .audit_mixin import AuditMixin, set_current_user_id, get_current_user_id
 from .security import role_required, get_current_user
+from .cache import CachedSchema, TTLCache, cached_response
+from .singleflight import SingleFlight
 
 __all__ = [
     'AuditMixin',
     'set_current_user_id',
     'get_current_user_id',
     'role_required',
-    'get_current_user'
+    'get_current_user',
+    'CachedSchema',
+    'TTLCache',
+    'cached_response',
+    'SingleFlight'
 ]
@@ -2,22 +2,31 @@
 AuditMixin - Gestion automatique de l'historisation
 Created_by, Updated_by, Created_at, Updated_at
 """
+from contextvars import ContextVar
 from datetime import datetime
-from flask import g
 from sqlalchemy import Column, Integer, DateTime, ForeignKey, event
 from sqlalchemy.orm import declared_attr
 
 from app.extensions import db
 
 
+# Utilisateur courant pour l'audit (remis à None à la fin de chaque contexte applicatif)
+_current_user_id = ContextVar('current_user_id', default=None)
+
+
 def get_current_user_id():
-    """Récupère l'ID de l'utilisateur courant depuis le contexte Flask"""
-    return getattr(g, 'current_user_id', None)
+    """Récupère l'ID de l'utilisateur courant"""
+    return _current_user_id.get()
 
 
 def set_current_user_id(user_id):
-    """Définit l'ID de l'utilisateur courant dans le contexte Flask"""
-    g.current_user_id = user_id
+    """Définit l'ID de l'utilisateur courant"""
+    _current_user_id.set(user_id)
+
+
+def reset_current_user_id(exception=None):
+    """Oublie l'utilisateur courant (teardown_appcontext): rien ne passe d'une requête à l'autre"""
+    _current_user_id.set(None)
 
 
 class AuditMixin:
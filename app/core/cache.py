@@ -0,0 +1,215 @@
+"""
+Cache - Caches en mémoire (par processus)
+"""
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from threading import Lock
+from time import monotonic
+
+from flask import request, current_app
+
+from app.core.utils import etag_matches, not_modified_response, json_body_response
+from app.core.singleflight import SingleFlight
+
+
+class CachedSchema:
+    """
+    Enveloppe un schema Marshmallow et met en cache le résultat de dump()
+    dans un LRU clé (id, updated_at).
+    Toute écriture fait avancer updated_at (AuditMixin): l'ancienne entrée
+    n'est plus jamais lue et finit évincée, sans invalidation explicite.
+    Les dicts retournés sont partagés: ne pas les modifier.
+    """
+
+    def __init__(self, schema, many=False, maxsize=512):
+        self.schema = schema
+        self.many = many
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = Lock()
+
+    def _dump_one(self, obj):
+        updated_at = getattr(obj, 'updated_at', None)
+        if obj.id is None or updated_at is None:
+            return self.schema.dump(obj)
+
+        key = (obj.id, updated_at)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                return data
+
+        data = self.schema.dump(obj)
+
+        with self._lock:
+            self._cache[key] = data
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+        return data
+
+    def dump(self, obj):
+        """Même API que Schema.dump"""
+        if self.many:
+            return [self._dump_one(o) for o in obj]
+        return self._dump_one(obj)
+
+    def clear(self):
+        """Vide le cache"""
+        with self._lock:
+            self._cache.clear()
+
+
+class TTLCache:
+    """
+    Cache clé/valeur en mémoire (par processus) avec expiration.
+    L'invalidation explicite ne concerne que le processus courant:
+    garder un TTL court quand plusieurs workers tournent.
+    """
+
+    def __init__(self, ttl=5, maxsize=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+        self._lock = Lock()
+
+    def get(self, key):
+        """Retourne la valeur ou None si absente/expirée"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Stocke une valeur pour ttl secondes (TTL par défaut sinon)"""
+        with self._lock:
+            self._data[key] = (monotonic() + (ttl or self.ttl), value)
+            if self.maxsize and len(self._data) > self.maxsize:
+                self._evict()
+
+    def _evict(self):
+        """Retire les entrées expirées, puis les plus anciennes si nécessaire"""
+        now = monotonic()
+        for key in [k for k, (expires_at, _) in self._data.items() if expires_at < now]:
+            del self._data[key]
+        while len(self._data) > self.maxsize:
+            del self._data[next(iter(self._data))]
+
+    def delete(self, key):
+        """Supprime une clé"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def get_or_set(self, key, factory, ttl=None):
+        """Retourne la valeur en cache ou la calcule via factory()"""
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+    @property
+    def hit_ratio(self):
+        """Taux de succès du cache depuis le démarrage du processus"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        """Vide le cache"""
+        with self._lock:
+            self._data.clear()
+
+
+# Réponses du dashboard: (endpoint, paramètres de requête) -> (corps JSON encodé, ETag)
+dashboard_cache = TTLCache(maxsize=1024)
+dashboard_flight = SingleFlight()
+
+
+def _cache_stream(chunks, cache, key, ttl):
+    """Relaie les morceaux d'une réponse en flux et stocke le corps complet à la fin"""
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    body = b''.join(body)
+    cache.set(key, (body, hashlib.md5(body).hexdigest()), ttl)
+
+
+def _cached_body_response(cached):
+    """Réponse servie depuis le cache: 304 si le client a déjà cette version"""
+    body, etag = cached
+    if etag_matches(etag):
+        response = not_modified_response(etag)
+    else:
+        response = json_body_response(body, etag=etag)
+    response.headers['X-Cache'] = 'HIT'
+    return response
+
+
+def cached_response(ttl_today=30, ttl_past=3600, cache=dashboard_cache):
+    """
+    Met en cache le corps des réponses 200 d'une route GET selon ses paramètres.
+    Une période terminée avant aujourd'hui (end_date passée) ne bouge plus:
+    TTL long. Sinon (période en cours ou end_date par défaut): TTL court.
+    Les données ne dépendent pas de l'utilisateur: la clé ne l'inclut pas.
+    Le corps est servi avec un ETag (hash du corps): 304 sans corps si le
+    client possède déjà cette version (If-None-Match).
+    Les requêtes identiques simultanées n'exécutent la vue qu'une fois (SingleFlight).
+    A placer après @jwt_required().
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (request.endpoint, tuple(sorted(request.args.items(multi=True))))
+
+            cached = cache.get(key)
+            if cached is not None:
+                return _cached_body_response(cached)
+
+            def compute():
+                response = current_app.make_response(fn(*args, **kwargs))
+                if response.status_code == 200:
+                    end_date = request.args.get('end_date')
+                    is_past = end_date is not None and end_date < datetime.utcnow().strftime('%Y-%m-%d')
+                    ttl = ttl_past if is_past else ttl_today
+                    if response.is_streamed:
+                        # Réponse en flux: mise en cache (et ETag) une fois entièrement envoyée
+                        response.response = _cache_stream(response.response, cache, key, ttl)
+                    else:
+                        body = response.get_data()
+                        etag = hashlib.md5(body).hexdigest()
+                        cache.set(key, (body, etag), ttl)
+                        response.set_etag(etag)
+                return response
+
+            # Rafraîchissement simultané par plusieurs onglets/utilisateurs:
+            # une seule requête exécute la vue, les autres lisent le cache qu'elle a rempli
+            response, shared = dashboard_flight.do(key, compute)
+            if shared:
+                cached = cache.get(key)
+                if cached is not None:
+                    return _cached_body_response(cached)
+                # Réponse non mise en cache (erreur, flux en cours): calculer la sienne
+                response = compute()
+
+            etag = response.get_etag()[0]
+            if etag and etag_matches(etag):
+                response = not_modified_response(etag)
+            response.headers['X-Cache'] = 'MISS'
+            current_app.logger.debug('dashboard cache_hit_ratio=%.3f', cache.hit_ratio)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,42 @@
+"""
+Compression - gzip des réponses JSON en flux
+Les réponses non streamées sont compressées par Flask-Compress (br/gzip).
+"""
+import zlib
+
+from flask import request, current_app
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Compresse un flux morceau par morceau (format gzip, wbits=31).
+    Chaque morceau est vidé (Z_SYNC_FLUSH) pour rester décodable au fil de l'eau.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_stream(response):
+    """
+    after_request: gzip des réponses JSON en flux si le client l'accepte.
+    Flask-Compress ignore ces réponses (COMPRESS_STREAMS=False) pour ne pas
+    les lire entièrement en mémoire avant l'envoi.
+    """
+    if (
+        not response.is_streamed
+        or response.status_code != 200
+        or response.mimetype not in current_app.config.get('COMPRESS_MIMETYPES', ['application/json'])
+        or 'Content-Encoding' in response.headers
+        or 'gzip' not in request.accept_encodings
+    ):
+        return response
+
+    response.response = gzip_chunks(response.response, current_app.config.get('COMPRESS_LEVEL', 6))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.headers.pop('Content-Length', None)
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,46 @@
+"""
+JSON Provider - Sérialisation JSON via orjson
+"""
+from decimal import Decimal
+
+import orjson
+from flask.json.provider import JSONProvider
+
+
+def _default(obj):
+    """Types non gérés nativement par orjson (même rendu que le provider Flask)"""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Provider JSON Flask basé sur orjson (sérialisation en C).
+    Utilisé par jsonify() et request.get_json().
+    """
+
+    sort_keys = True
+
+    def _options(self):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self._options()).decode('utf-8')
+
+    def dumpb(self, obj):
+        """Comme dumps mais retourne directement les bytes (réponses en flux)"""
+        return orjson.dumps(obj, default=_default, option=self._options())
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_default, option=self._options())
+        return self._app.response_class(body, mimetype='application/json')
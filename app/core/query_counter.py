@@ -0,0 +1,41 @@
+"""
+Query counter - Nombre de requêtes SQL par requête HTTP
+Repère les régressions N+1 (sérialiseur qui charge une relation par ligne).
+"""
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+from app.extensions import db
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    """before_cursor_execute: compte les requêtes exécutées pendant la requête HTTP"""
+    if has_app_context() and 'sql_query_count' in g:
+        g.sql_query_count += 1
+
+
+def init_query_counter(app):
+    """
+    Active le comptage si SQL_QUERY_COUNT_WARN > 0: en-tête X-Query-Count sur
+    chaque réponse et avertissement dans les logs au-delà du seuil.
+    """
+    threshold = app.config.get('SQL_QUERY_COUNT_WARN', 0)
+    if threshold <= 0:
+        return
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _count_statement)
+
+    @app.before_request
+    def start_query_count():
+        g.sql_query_count = 0
+
+    @app.after_request
+    def report_query_count(response):
+        count = g.get('sql_query_count')
+        if count is None:
+            return response
+        response.headers['X-Query-Count'] = str(count)
+        if count > threshold:
+            app.logger.warning('%s %s: %d requêtes SQL (seuil %d)', request.method, request.path, count, threshold)
+        return response
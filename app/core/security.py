@@ -1,11 +1,14 @@
 """
 Sécurité - JWT et gestion des rôles
 """
-from functools import wraps
+from functools import wraps, lru_cache
 from flask import jsonify, g
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+from sqlalchemy import select
 
-from app.core.audit_mixin import set_current_user_id
+from app.extensions import db
+from app.core.audit_mixin import set_current_user_id, get_current_user_id
+from app.core.cache import TTLCache
 
 
 class UserRoles:
@@ -18,24 +21,99 @@ class UserRoles:
     ALL_ROLES = [SIMPLE_UTILISATEUR, CONTROLEUR, ADMIN, LIVREUR]
 
 
+# Version de token courante par utilisateur (évite de recharger la ligne User au refresh).
+# Cache par processus: un token révoqué reste accepté par les autres workers au plus ttl secondes
+token_versions_cache = TTLCache(ttl=30)
+
+
+@lru_cache(maxsize=1024)
+def _build_token_claims(role, email, nom, is_active, token_version):
+    """Dict de claims mémorisé par combinaison de valeurs"""
+    return {
+        'role': role,
+        'email': email,
+        'nom': nom,
+        'is_active': is_active,
+        'tv': token_version
+    }
+
+
+def get_token_claims(user):
+    """
+    Claims JWT additionnels d'un utilisateur (rôle, email, nom, statut, version).
+    Le dict est partagé entre les appels: ne pas le modifier.
+    """
+    return _build_token_claims(
+        user.role, user.email, user.full_name, user.is_active, user.token_version or 0
+    )
+
+
+def get_token_claims_from_jwt(claims):
+    """Reconduit les claims additionnels d'un token existant (refresh)"""
+    return _build_token_claims(
+        claims.get('role'), claims.get('email'), claims.get('nom'),
+        claims.get('is_active'), claims.get('tv', 0)
+    )
+
+
+def get_token_version(user_id):
+    """
+    Version de token courante d'un utilisateur (None s'il est supprimé).
+    Lit uniquement la colonne token_version, mise en cache ttl secondes.
+    """
+    def load():
+        from app.models.user import User
+        return db.session.execute(
+            select(User.token_version).where(User.id == user_id, User.is_deleted == False)
+        ).scalar()
+
+    return token_versions_cache.get_or_set(user_id, load)
+
+
+def invalidate_token_version(user_id):
+    """À appeler après le commit d'un revoke_tokens()"""
+    token_versions_cache.delete(user_id)
+
+
 def get_current_user():
-    """Récupère l'utilisateur courant depuis le contexte"""
-    return getattr(g, 'current_user', None)
+    """
+    Récupère l'utilisateur courant depuis le contexte.
+    Chargé au plus une fois par requête puis conservé sur g (référence forte).
+    """
+    if 'current_user' not in g:
+        from app.models.user import User
+        user_id = get_current_user_id()
+        g.current_user = db.session.get(User, user_id) if user_id else None
+    return g.current_user
+
+
+def _get_verified_claims():
+    """Claims du token courant, sans re-décoder s'il a déjà été vérifié (@jwt_required)"""
+    try:
+        return get_jwt()
+    except RuntimeError:
+        verify_jwt_in_request()
+        return get_jwt()
 
 
 def role_required(*roles):
     """
     Décorateur pour vérifier les rôles requis.
+    Le rôle est lu dans les claims du JWT (aucun accès base, tv non vérifié).
+    Un changement de rôle incrémente token_version: le refresh est refusé,
+    mais l'access token déjà émis garde l'ancien rôle jusqu'à son expiration
+    (JWT_ACCESS_TOKEN_EXPIRES).
     Usage: @role_required('admin', 'controleur')
     """
+    allowed = frozenset(roles)
+
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            verify_jwt_in_request()
-            claims = get_jwt()
+            claims = _get_verified_claims()
             user_role = claims.get('role', None)
 
-            if user_role not in roles:
+            if user_role not in allowed:
                 return jsonify({
                     'error': 'Accès refusé',
                     'message': f'Rôle requis: {", ".join(roles)}'
@@ -48,20 +126,13 @@ def role_required(*roles):
 
 def jwt_user_loader(fn):
     """
-    Décorateur pour charger automatiquement l'utilisateur depuis le JWT
-    et injecter son ID dans le contexte pour l'audit.
+    Décorateur pour injecter l'ID de l'utilisateur du JWT dans le contexte pour l'audit.
+    Aucun accès base: la ligne User n'est chargée que si la vue appelle get_current_user().
     """
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        set_current_user_id(user_id)
-
-        # Charger l'utilisateur dans le contexte
-        from app.models.user import User
-        user = User.query.get(user_id)
-        g.current_user = user
-
+        _get_verified_claims()
+        set_current_user_id(get_jwt_identity())
         return fn(*args, **kwargs)
     return wrapper
 
@@ -0,0 +1,53 @@
+"""
+SingleFlight - Regroupement des calculs identiques concurrents (par processus)
+"""
+from threading import Event, Lock
+
+
+class _Call:
+    """Calcul en cours pour une clé"""
+
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+        self.exc = None
+
+
+class SingleFlight:
+    """
+    Un seul appel de fn par clé à la fois: les appels concurrents sur la même
+    clé attendent la fin du premier et reçoivent son résultat (ou son exception).
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = Lock()
+
+    def do(self, key, fn):
+        """
+        Exécute fn() ou attend l'appel déjà en cours pour cette clé.
+        Retourne (résultat, shared), shared=True si le résultat vient d'un autre appel.
+        """
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.exc is not None:
+                raise call.exc
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as exc:
+            call.exc = exc
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
+        return call.result, False
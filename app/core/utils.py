@@ -1,7 +1,13 @@
 """
 Utilitaires communs
 """
-from flask import request, current_app
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+from flask import request, current_app, jsonify
+from sqlalchemy import func, tuple_, literal, DateTime
 
 
 def get_pagination_params():
@@ -19,22 +25,176 @@ def get_pagination_params():
     return page, per_page
 
 
+def search_pattern(search, min_length=2):
+    """
+    Motif ILIKE '%...%' pour un paramètre search, à utiliser avec escape='\\'.
+    Les jokers saisis (%, _) sont échappés et cherchés littéralement.
+    Retourne None (pas de filtre) si la recherche est vide ou trop courte.
+    """
+    search = (search or '').strip()
+    if len(search) < min_length:
+        return None
+    escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def estimate_count(query):
+    """
+    Nombre de lignes estimé par le planificateur PostgreSQL (EXPLAIN, sans exécuter la requête).
+    Tient compte des filtres, contrairement à pg_class.reltuples. None hors PostgreSQL.
+    """
+    session = query.session
+    dialect = session.get_bind().dialect
+    if dialect.name != 'postgresql':
+        return None
+
+    compiled = query.order_by(None).statement.compile(dialect=dialect)
+    plan = session.connection().exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params).scalar()
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def paginate_page(query, page, per_page, window_count=False, estimate=False, exact_count=False):
+    """
+    Page d'une requête: (lignes, infos de pagination).
+    estimate: au-delà de PAGINATION_COUNT_ESTIMATE_THRESHOLD lignes estimées (PostgreSQL),
+    et sauf exact_count, le COUNT(*) n'est pas exécuté: total et pages valent None et
+    total_estimate les remplace. Réservé aux très grandes listes (coût d'un EXPLAIN).
+    window_count: total exact lu sur la page même (COUNT(*) OVER ()), sans second aller-retour.
+    """
+    page = max(page, 1)
+
+    if estimate and not exact_count:
+        estimate = estimate_count(query)
+        if estimate is not None and estimate > current_app.config.get('PAGINATION_COUNT_ESTIMATE_THRESHOLD', 50000):
+            # Une ligne de plus que la page: has_next sans compter
+            rows = query.limit(per_page + 1).offset((page - 1) * per_page).all()
+            return rows[:per_page], {
+                'page': page,
+                'per_page': per_page,
+                'total': None,
+                'pages': None,
+                'total_estimate': estimate,
+                'has_next': len(rows) > per_page,
+                'has_prev': page > 1
+            }
+
+    if window_count:
+        return _paginate_window_count(query, page, per_page)
+
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    return pagination.items, {
+        'page': pagination.page,
+        'per_page': pagination.per_page,
+        'total': pagination.total,
+        'pages': pagination.pages,
+        'has_next': pagination.has_next,
+        'has_prev': pagination.has_prev
+    }
+
+
+def _paginate_window_count(query, page, per_page):
+    """
+    Page et total en une requête: colonne total_count = COUNT(*) OVER ().
+    Requête à un seul élément (entité ou colonne): lignes réduites à cet élément;
+    sinon les lignes gardent total_count (accès par nom de colonne inchangé).
+    Seule une page au-delà de la fin (aucune ligne) demande un COUNT(*) séparé.
+    """
+    rows = query.add_columns(func.count().over().label('total_count'))\
+        .limit(per_page).offset((page - 1) * per_page).all()
+
+    if rows:
+        total = rows[0].total_count
+        if len(rows[0]) == 2:
+            rows = [row[0] for row in rows]
+    else:
+        total = query.order_by(None).count() if page > 1 else 0
+
+    pages = (total + per_page - 1) // per_page
+    return rows, {
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': pages,
+        'has_next': page < pages,
+        'has_prev': page > 1
+    }
+
+
 def paginate_query(query, schema):
     """
     Pagine une requête SQLAlchemy et retourne le résultat formaté.
     """
     page, per_page = get_pagination_params()
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    items, pagination = paginate_page(query, page, per_page)
+
+    return {
+        'items': schema.dump(items),
+        'pagination': pagination
+    }
+
+
+def encode_cursor(values):
+    """Encode les valeurs de la clé de tri de la dernière ligne en curseur opaque"""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, columns):
+    """
+    Décode un curseur en valeurs typées selon les colonnes de tri.
+    Lève ValueError si le curseur est invalide.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Curseur invalide')
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('Curseur invalide')
+
+    return [
+        datetime.fromisoformat(v) if isinstance(col.type, DateTime) and v is not None else v
+        for col, v in zip(columns, values)
+    ]
+
+
+def keyset_paginate(query, columns, schema, descending=False, key_getter=None, serializer=None):
+    """
+    Pagination par curseur (keyset) sur un tuple de colonnes de tri.
+    Pas de COUNT(*) ni d'OFFSET: WHERE (cols) > (:valeurs) ORDER BY cols LIMIT n+1.
+    La dernière colonne doit être unique (ex: id) pour un ordre total.
+    serializer: fonction appliquée à chaque ligne à la place de schema.dump.
+    Lève ValueError si le curseur est invalide.
+    """
+    _, per_page = get_pagination_params()
+    cursor = request.args.get('cursor')
+
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        key = tuple_(*columns)
+        bound = tuple_(*[literal(v, type_=col.type) for col, v in zip(columns, values)])
+        query = query.filter(key < bound if descending else key > bound)
+
+    query = query.order_by(*[col.desc() if descending else col.asc() for col in columns])
+    rows = query.limit(per_page + 1).all()
+
+    has_next = len(rows) > per_page
+    items = rows[:per_page]
+
+    next_cursor = None
+    if has_next:
+        last = items[-1]
+        if key_getter:
+            next_cursor = encode_cursor(key_getter(last))
+        else:
+            next_cursor = encode_cursor([getattr(last, col.key) for col in columns])
 
     return {
-        'items': schema.dump(pagination.items),
+        'items': [serializer(item) for item in items] if serializer else schema.dump(items),
         'pagination': {
-            'page': pagination.page,
-            'per_page': pagination.per_page,
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'has_next': pagination.has_next,
-            'has_prev': pagination.has_prev
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_next': has_next
         }
     }
 
@@ -63,7 +223,8 @@ def api_response(data=None, message=None, status_code=200, errors=None):
 def get_date_range_params():
     """
     Récupère les paramètres de plage de dates depuis la requête.
-    Retourne (start_date, end_date)
+    Retourne (start_date, end_date, periode), periode étant le dict
+    {'start_date', 'end_date'} des réponses, construit une seule fois.
     """
     from datetime import datetime, timedelta
 
@@ -81,4 +242,71 @@ def get_date_range_params():
     else:
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
 
-    return start_date, end_date
+    periode = {
+        'start_date': start_date.date().isoformat(),
+        'end_date': end_date.date().isoformat()
+    }
+
+    return start_date, end_date, periode
+
+
+def make_etag(*parts):
+    """
+    Construit un ETag à partir des éléments de version d'une ressource
+    (ex: MAX(updated_at), nombre de lignes).
+    """
+    return hashlib.md5(':'.join(str(p) for p in parts).encode()).hexdigest()
+
+
+# Suffixes ajoutés par Flask-Compress à l'ETag des réponses compressées ("<etag>:br")
+_COMPRESSED_ETAG_SUFFIXES = (':br', ':gzip', ':deflate')
+
+
+def etag_matches(etag):
+    """
+    Vérifie si le client possède déjà cette version (If-None-Match).
+    Accepte aussi les variantes suffixées par Flask-Compress, que le client
+    renvoie telles quelles après une réponse compressée.
+    """
+    if_none_match = request.if_none_match
+    return if_none_match.contains(etag) or any(
+        if_none_match.contains(etag + suffix) for suffix in _COMPRESSED_ETAG_SUFFIXES
+    )
+
+
+def not_modified_response(etag, last_modified=None):
+    """Réponse 304 sans corps"""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
+
+
+def json_body_response(body, etag=None, last_modified=None, status_code=200):
+    """
+    Réponse à partir d'un corps JSON déjà encodé (ex: payload mis en cache),
+    sans repasser par jsonify.
+    """
+    response = current_app.response_class(body, status=status_code, mimetype='application/json')
+    if etag:
+        response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
+
+
+def etag_response(payload, etag, last_modified=None, status_code=200):
+    """
+    Réponse JSON avec ETag/Last-Modified.
+    Retourne 304 si le client possède déjà cette version.
+    """
+    if etag_matches(etag):
+        return not_modified_response(etag, last_modified)
+
+    response = jsonify(payload)
+    response.status_code = status_code
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
@@ -6,9 +6,13 @@ from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_marshmallow import Marshmallow
+from flask_compress import Compress
 
 # Database
-db = SQLAlchemy()
+# expire_on_commit=False: après commit, la réponse est sérialisée depuis les objets
+# déjà chargés (aucun re-SELECT). La session est propre à chaque requête et aucune
+# colonne n'a de valeur calculée par le serveur (server_default).
+db = SQLAlchemy(session_options={'expire_on_commit': False})
 
 # Migrations
 migrate = Migrate()
@@ -21,3 +25,6 @@ cors = CORS()
 
 # Marshmallow pour la sérialisation
 ma = Marshmallow()
+
+# Compression des réponses (br/gzip selon Accept-Encoding)
+compress = Compress()
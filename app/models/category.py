@@ -10,9 +10,17 @@ class Category(db.Model, AuditMixin, SoftDeleteMixin):
     Modèle Catégorie avec historisation complète.
     """
     __tablename__ = 'categories'
+    __table_args__ = (
+        # Unicité du nom limitée aux catégories non supprimées
+        db.Index(
+            'ix_categories_nom_active', 'nom', unique=True,
+            postgresql_where=db.text('is_deleted = false'),
+            sqlite_where=db.text('is_deleted = 0')
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    nom = db.Column(db.String(100), nullable=False, unique=True)
+    nom = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     image_url = db.Column(db.String(500), nullable=True)
     ordre = db.Column(db.Integer, default=0)
@@ -24,8 +32,13 @@ class Category(db.Model, AuditMixin, SoftDeleteMixin):
     def __repr__(self):
         return f'<Category {self.nom}>'
 
-    def to_dict(self):
-        """Conversion en dictionnaire"""
+    def to_dict(self, products_count=None):
+        """
+        Conversion en dictionnaire.
+        products_count: nombre de produits déjà calculé par l'appelant (évite la requête COUNT)
+        """
+        if products_count is None:
+            products_count = self.products.filter_by(is_deleted=False).count()
         return {
             'id': self.id,
             'nom': self.nom,
@@ -33,7 +46,7 @@ class Category(db.Model, AuditMixin, SoftDeleteMixin):
             'image_url': self.image_url,
             'ordre': self.ordre,
             'is_active': self.is_active,
-            'products_count': self.products.filter_by(is_deleted=False).count(),
+            'products_count': products_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'created_by': self.created_by,
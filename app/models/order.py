@@ -109,7 +109,8 @@ class Order(db.Model, AuditMixin, SoftDeleteMixin):
     livreur_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # Livreur assigné
 
     # Relations
-    items = db.relationship('OrderItem', backref='order', lazy='joined', cascade='all, delete-orphan')
+    # selectin: une requête IN (...) par lot de commandes, pas de JOIN qui duplique les lignes de commande
+    items = db.relationship('OrderItem', backref='order', lazy='selectin', cascade='all, delete-orphan')
     livreur = db.relationship('User', foreign_keys=[livreur_id], backref='livraisons')
     creator = db.relationship('User', foreign_keys=[user_id], backref='orders_created')
     history = db.relationship('OrderHistory', backref='order', lazy='dynamic', order_by='OrderHistory.created_at.desc()')
@@ -12,13 +12,21 @@ class Product(db.Model, AuditMixin, SoftDeleteMixin):
     Modèle Produit/Article avec historisation complète.
     """
     __tablename__ = 'products'
+    __table_args__ = (
+        # Unicité du SKU limitée aux produits non supprimés
+        db.Index(
+            'ix_products_sku_active', 'sku', unique=True,
+            postgresql_where=db.text('is_deleted = false'),
+            sqlite_where=db.text('is_deleted = 0')
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(200), nullable=False, index=True)
     description = db.Column(db.Text, nullable=True)
     prix = db.Column(db.Numeric(10, 2), nullable=False)
     photo_url = db.Column(db.String(500), nullable=True)
-    sku = db.Column(db.String(50), unique=True, nullable=True)  # Code produit unique
+    sku = db.Column(db.String(50), nullable=True)  # Code produit unique (produits non supprimés)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
 
     # Foreign Keys
@@ -2,18 +2,49 @@
 Modèle User - Utilisateurs avec rôles et audit
 """
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+
+import bcrypt
+from flask import current_app
+from werkzeug.security import check_password_hash
 
 from app.extensions import db
 from app.core.audit_mixin import AuditMixin, SoftDeleteMixin, register_audit_listeners
 
 
+# Préfixes des hash bcrypt (les anciens hash pbkdf2 de werkzeug restent vérifiables)
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+
+# Hash factice utilisé pour égaliser le temps de réponse quand l'utilisateur n'existe pas
+_dummy_password_hash = None
+
+
+def _bcrypt_rounds():
+    """Facteur de coût bcrypt configuré"""
+    return current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
+
+
+def _get_dummy_password_hash():
+    """Calcule (une seule fois) le hash factice au coût configuré"""
+    global _dummy_password_hash
+    if _dummy_password_hash is None:
+        _dummy_password_hash = bcrypt.hashpw(b'dummy-password', bcrypt.gensalt(rounds=_bcrypt_rounds()))
+    return _dummy_password_hash
+
+
 class User(db.Model, AuditMixin, SoftDeleteMixin):
     """
     Modèle Utilisateur avec historisation complète.
     Rôles: simple_utilisateur, controleur, admin, livreur
     """
     __tablename__ = 'users'
+    __table_args__ = (
+        # Recherche d'email insensible à la casse parmi les utilisateurs non supprimés (login)
+        db.Index(
+            'ix_users_email_active', db.func.lower(db.text('email')), unique=True,
+            postgresql_where=db.text('is_deleted = false'),
+            sqlite_where=db.text('is_deleted = 0')
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), unique=True, nullable=False, index=True)
@@ -24,6 +55,8 @@ class User(db.Model, AuditMixin, SoftDeleteMixin):
     role = db.Column(db.String(50), nullable=False, default='simple_utilisateur')
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     last_login = db.Column(db.DateTime, nullable=True)
+    # Incrémenté pour invalider les tokens déjà émis (désactivation, suppression, changement de rôle)
+    token_version = db.Column(db.Integer, default=0, nullable=False)
 
     # Relations
     orders = db.relationship('Order', backref='user', lazy='dynamic', foreign_keys='Order.user_id')
@@ -32,13 +65,38 @@ class User(db.Model, AuditMixin, SoftDeleteMixin):
         return f'<User {self.email}>'
 
     def set_password(self, password):
-        """Hash et stocke le mot de passe"""
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        """Hash (bcrypt) et stocke le mot de passe"""
+        hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=_bcrypt_rounds()))
+        self.password_hash = hashed.decode('utf-8')
 
     def check_password(self, password):
-        """Vérifie le mot de passe"""
+        """
+        Vérifie le mot de passe en temps constant.
+        bcrypt pour les nouveaux hash, werkzeug (pbkdf2) pour les hash existants.
+        """
+        if self.password_hash.startswith(BCRYPT_PREFIXES):
+            return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
         return check_password_hash(self.password_hash, password)
 
+    @property
+    def needs_rehash(self):
+        """Indique si le hash stocké est un ancien format (pbkdf2) à migrer vers bcrypt"""
+        return not self.password_hash.startswith(BCRYPT_PREFIXES)
+
+    @staticmethod
+    def check_dummy_password(password):
+        """
+        Effectue une vérification factice pour un utilisateur inexistant.
+        Le coût du hash est payé dans tous les cas : le temps de réponse
+        ne permet pas de deviner si un email existe.
+        """
+        bcrypt.checkpw(password.encode('utf-8'), _get_dummy_password_hash())
+        return False
+
+    def revoke_tokens(self):
+        """Invalide les refresh tokens émis (claim tv obsolète)"""
+        self.token_version = (self.token_version or 0) + 1
+
     def update_last_login(self):
         """Met à jour la date de dernière connexion"""
         self.last_login = datetime.utcnow()
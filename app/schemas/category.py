@@ -1,7 +1,7 @@
 """
 Schemas Category - Sérialisation et validation des catégories
 """
-from marshmallow import Schema, fields, validate, validates, ValidationError
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
 
 
 class CategorySchema(Schema):
@@ -27,12 +27,13 @@ class CategoryCreateSchema(Schema):
     ordre = fields.Int(load_default=0)
     is_active = fields.Bool(load_default=True)
 
-    @validates('nom')
-    def validate_nom_unique(self, value):
+    @validates_schema
+    def validate_nom_unique(self, data, **kwargs):
+        # Après la validation des champs: aucune requête si les données sont invalides
         from app.models.category import Category
-        existing = Category.query.filter_by(nom=value, is_deleted=False).first()
+        existing = Category.query.filter_by(nom=data['nom'], is_deleted=False).first()
         if existing:
-            raise ValidationError('Une catégorie avec ce nom existe déjà.')
+            raise ValidationError('Une catégorie avec ce nom existe déjà.', 'nom')
 
 
 class CategoryUpdateSchema(Schema):
@@ -44,6 +44,11 @@ class OrderItemCreateSchema(Schema):
             raise ValidationError('Produit non trouvé.')
 
 
+class OrderItemQuantityUpdateSchema(Schema):
+    """Schema pour modifier la quantité d'une ligne de commande"""
+    quantity = fields.Int(required=True, strict=True, validate=validate.Range(min=1))
+
+
 class LivreurSchema(Schema):
     """Schema pour les informations du livreur"""
     id = fields.Int()
@@ -1,7 +1,8 @@
 """
 Schemas Product - Sérialisation et validation des produits
 """
-from marshmallow import Schema, fields, validate, validates, ValidationError
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+from sqlalchemy import select, exists
 
 
 class StockInfoSchema(Schema):
@@ -42,20 +43,26 @@ class ProductCreateSchema(Schema):
     stock_initial = fields.Int(load_default=0, validate=validate.Range(min=0))
     seuil_alerte = fields.Int(load_default=10, validate=validate.Range(min=0))
 
-    @validates('category_id')
-    def validate_category_exists(self, value):
+    @validates_schema
+    def validate_references(self, data, **kwargs):
+        # Après la validation des champs: aucune requête si les données sont invalides
+        from app.extensions import db
         from app.models.category import Category
-        category = Category.query.filter_by(id=value, is_deleted=False).first()
-        if not category:
-            raise ValidationError('Catégorie non trouvée.')
+        from app.models.product import Product
 
-    @validates('sku')
-    def validate_sku_unique(self, value):
-        if value:
-            from app.models.product import Product
-            existing = Product.query.filter_by(sku=value, is_deleted=False).first()
-            if existing:
-                raise ValidationError('Ce SKU est déjà utilisé.')
+        # Contrôles d'existence: SELECT EXISTS, sans charger de ligne
+        category_exists = db.session.execute(select(exists().where(
+            Category.id == data['category_id'], Category.is_deleted == False
+        ))).scalar()
+        if not category_exists:
+            raise ValidationError('Catégorie non trouvée.', 'category_id')
+
+        if data.get('sku'):
+            sku_taken = db.session.execute(select(exists().where(
+                Product.sku == data['sku'], Product.is_deleted == False
+            ))).scalar()
+            if sku_taken:
+                raise ValidationError('Ce SKU est déjà utilisé.', 'sku')
 
 
 class ProductUpdateSchema(Schema):
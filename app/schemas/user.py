@@ -1,11 +1,22 @@
 """
 Schemas User - Sérialisation et validation des utilisateurs
 """
-from marshmallow import Schema, fields, validate, validates, ValidationError
+from marshmallow import Schema, fields, validate, validates_schema, pre_load, ValidationError
 
 from app.core.security import UserRoles
 
 
+# Validateurs partagés entre les instances de schema
+EMAIL_LENGTH = validate.Length(max=254)
+
+
+def normalize_email(data):
+    """Met l'email en minuscules une seule fois, avant validation"""
+    if isinstance(data, dict) and isinstance(data.get('email'), str):
+        data = dict(data, email=data['email'].strip().lower())
+    return data
+
+
 class UserSchema(Schema):
     """Schema pour la lecture d'un utilisateur"""
     id = fields.Int(dump_only=True)
@@ -24,7 +35,7 @@ class UserSchema(Schema):
 
 class UserCreateSchema(Schema):
     """Schema pour la création d'un utilisateur"""
-    email = fields.Email(required=True)
+    email = fields.Email(required=True, validate=EMAIL_LENGTH)
     password = fields.Str(required=True, load_only=True, validate=validate.Length(min=6))
     nom = fields.Str(required=True, validate=validate.Length(min=1, max=100))
     prenom = fields.Str(required=True, validate=validate.Length(min=1, max=100))
@@ -32,17 +43,26 @@ class UserCreateSchema(Schema):
     role = fields.Str(validate=validate.OneOf(UserRoles.ALL_ROLES), load_default='simple_utilisateur')
     is_active = fields.Bool(load_default=True)
 
-    @validates('email')
-    def validate_email_unique(self, value):
+    @pre_load
+    def normalize(self, data, **kwargs):
+        return normalize_email(data)
+
+    @validates_schema
+    def validate_email_unique(self, data, **kwargs):
+        # Après la validation des champs: aucune requête si les données sont invalides
         from app.models.user import User
-        existing = User.query.filter_by(email=value, is_deleted=False).first()
+        from app.extensions import db
+        existing = User.query.filter(
+            db.func.lower(User.email) == data['email'],
+            User.is_deleted == False
+        ).first()
         if existing:
-            raise ValidationError('Cet email est déjà utilisé.')
+            raise ValidationError('Cet email est déjà utilisé.', 'email')
 
 
 class UserUpdateSchema(Schema):
     """Schema pour la mise à jour d'un utilisateur"""
-    email = fields.Email()
+    email = fields.Email(validate=EMAIL_LENGTH)
     password = fields.Str(load_only=True, validate=validate.Length(min=6))
     nom = fields.Str(validate=validate.Length(min=1, max=100))
     prenom = fields.Str(validate=validate.Length(min=1, max=100))
@@ -50,8 +70,16 @@ class UserUpdateSchema(Schema):
     role = fields.Str(validate=validate.OneOf(UserRoles.ALL_ROLES))
     is_active = fields.Bool()
 
+    @pre_load
+    def normalize(self, data, **kwargs):
+        return normalize_email(data)
+
 
 class LoginSchema(Schema):
     """Schema pour le login"""
-    email = fields.Email(required=True)
+    email = fields.Email(required=True, validate=EMAIL_LENGTH)
     password = fields.Str(required=True, load_only=True)
+
+    @pre_load
+    def normalize(self, data, **kwargs):
+        return normalize_email(data)
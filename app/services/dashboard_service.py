@@ -1,8 +1,15 @@
 """
 Service Dashboard - KPIs et statistiques
 """
-from datetime import datetime, timedelta
-from sqlalchemy import func, and_, extract
+from datetime import datetime, timedelta, time
+from itertools import chain
+from flask import current_app, has_app_context
+from sqlalchemy import (
+    func, and_, or_, extract, event, select, update, union_all, text, table, column, cast, literal_column,
+    Date, DateTime, Numeric, Integer, Text
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from sqlalchemy.orm import Session, selectinload
 from decimal import Decimal
 
 from app.extensions import db
@@ -10,11 +17,220 @@ from app.models.order import Order, OrderItem, OrderStatus
 from app.models.product import Product
 from app.models.category import Category
 from app.models.stock import Stock
+from app.core.cache import TTLCache
+
+
+# Vue matérialisée des ventes par jour (migration 009), hors metadata: jamais créée par create_all
+ventes_par_jour_mv = table(
+    'ventes_par_jour_mv',
+    column('jour', Date),
+    column('total', Numeric),
+    column('nombre_commandes', Integer)
+)
+
+# Ventes quotidiennes par produit (migration 011): base des ventes par article / catégorie
+ventes_articles_par_jour_mv = table(
+    'ventes_articles_par_jour_mv',
+    column('jour', Date),
+    column('product_id', Integer),
+    column('quantity', Integer),
+    column('prix_total', Numeric)
+)
+
+# Fraîcheur des vues (migration 021): jours < refreshed_until complets au dernier rafraîchissement
+dashboard_views_refresh = table(
+    'dashboard_views_refresh',
+    column('view_name', Text),
+    column('refreshed_until', Date),
+    column('refreshed_at', DateTime)
+)
+DASHBOARD_MATERIALIZED_VIEWS = ('ventes_par_jour_mv', 'ventes_articles_par_jour_mv')
+
+# {vue: refreshed_until}, relu au plus toutes les minutes (rafraîchissement par un autre processus)
+views_refresh_cache = TTLCache(ttl=60)
+VIEWS_REFRESH_KEY = 'refreshed_until'
+# Marqueur de transaction (session.info): limite de fraîcheur abaissée par lower_views_refresh
+_VIEWS_REFRESH_LOWERED = 'views_refresh_lowered'
+
+# État des stocks: instantané identique pour tous, invalidé après tout commit
+# modifiant un Stock ou un Product (le TTL couvre les autres workers)
+etat_stocks_cache = TTLCache(ttl=60)
+ETAT_STOCKS_KEY = 'etat_stocks'
+# Marqueur de transaction (session.info): passer par DashboardService.mark_etat_stocks_dirty
+_ETAT_STOCKS_DIRTY = 'etat_stocks_dirty'
+
+
+@event.listens_for(Session, 'after_flush')
+def track_stock_changes(session, flush_context):
+    """Marque la transaction si elle touche aux stocks ou aux produits"""
+    if any(isinstance(obj, (Stock, Product)) for obj in chain(session.new, session.dirty, session.deleted)):
+        DashboardService.mark_etat_stocks_dirty(session)
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_etat_stocks(session):
+    """Invalide l'état des stocks une fois la transaction validée"""
+    if session.info.pop(_ETAT_STOCKS_DIRTY, False):
+        etat_stocks_cache.delete(ETAT_STOCKS_KEY)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def reset_stock_changes(session, previous_transaction):
+    session.info.pop(_ETAT_STOCKS_DIRTY, None)
+
+
+@event.listens_for(Session, 'after_flush')
+def lower_views_refresh(session, flush_context):
+    """
+    Commande d'un jour passé modifiée (statut, annulation, suppression, lignes):
+    la limite de fraîcheur des vues redescend à ce jour, dans la même transaction.
+    Ce jour est relu sur orders jusqu'au prochain rafraîchissement.
+    """
+    if not has_app_context() or not current_app.config.get('DASHBOARD_USE_MATERIALIZED_VIEWS'):
+        return
+
+    today = datetime.utcnow().date()
+    days = [
+        obj.created_at.date() for obj in chain(session.dirty, session.deleted)
+        if isinstance(obj, Order) and obj.created_at is not None and obj.created_at.date() < today
+    ]
+    if not days:
+        return
+
+    day = min(days)
+    session.connection().execute(
+        update(dashboard_views_refresh)
+        .where(
+            dashboard_views_refresh.c.view_name.in_(DASHBOARD_MATERIALIZED_VIEWS),
+            dashboard_views_refresh.c.refreshed_until > day
+        )
+        .values(refreshed_until=day)
+    )
+    session.info[_VIEWS_REFRESH_LOWERED] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_views_refresh(session):
+    """Relit la limite de fraîcheur abaissée (processus courant; les autres: TTL)"""
+    if session.info.pop(_VIEWS_REFRESH_LOWERED, False):
+        views_refresh_cache.clear()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def reset_views_refresh(session, previous_transaction):
+    session.info.pop(_VIEWS_REFRESH_LOWERED, None)
+
+
+def _json_agg(element, order_by):
+    """
+    Agrège des objets JSON en un tableau côté PostgreSQL et le retourne en texte
+    (cast: psycopg2 décoderait sinon le JSON en objets Python).
+    """
+    stmt = select(cast(
+        func.coalesce(func.json_agg(aggregate_order_by(element, order_by)), literal_column("'[]'::json")),
+        Text
+    ))
+    return db.session.execute(stmt).scalar()
+
+
+def _views_refreshed_until():
+    """Limite de fraîcheur de chaque vue matérialisée (absente: jamais rafraîchie)"""
+    def load():
+        rows = db.session.execute(
+            select(dashboard_views_refresh.c.view_name, dashboard_views_refresh.c.refreshed_until)
+        ).all()
+        return {row.view_name: row.refreshed_until for row in rows}
+
+    return views_refresh_cache.get_or_set(VIEWS_REFRESH_KEY, load)
+
+
+def _materialized_window(start_date, end_date, view):
+    """
+    Jours complets [first_full_day, cutoff[ de la période servis par les vues
+    matérialisées (jours passés déjà couverts par le dernier rafraîchissement
+    de la vue), ou None si aucun / vues désactivées.
+    Le reste de la période (jours partiels en bordure, jours non encore
+    rafraîchis, aujourd'hui) se lit sur orders.
+    """
+    if not current_app.config.get('DASHBOARD_USE_MATERIALIZED_VIEWS'):
+        return None
+
+    first_full_day = datetime.combine(start_date.date(), time.min)
+    if first_full_day < start_date:
+        first_full_day += timedelta(days=1)
+    cutoff = min(
+        datetime.combine(end_date.date(), time.min),
+        datetime.combine(datetime.utcnow().date(), time.min)
+    )
+    refreshed_until = _views_refreshed_until().get(view)
+    if refreshed_until is None:
+        return None
+    cutoff = min(cutoff, datetime.combine(refreshed_until, time.min))
+
+    if first_full_day >= cutoff:
+        return None
+    return first_full_day, cutoff
+
+
+def _lignes_vendues(start_date, end_date):
+    """
+    Source (product_id, quantity, prix_total) des articles vendus sur la période.
+    Jours complets déjà rafraîchis: agrégats quotidiens par produit de
+    ventes_articles_par_jour_mv; bordures, jours non rafraîchis et aujourd'hui:
+    lignes de commande.
+    """
+    valid_statuses = [
+        OrderStatus.CONFIRMEE.value,
+        OrderStatus.EN_PREPARATION.value,
+        OrderStatus.EN_LIVRAISON.value,
+        OrderStatus.LIVREE.value
+    ]
+
+    def live(*ranges):
+        return select(
+            OrderItem.product_id,
+            OrderItem.quantity,
+            OrderItem.prix_total
+        ).join(
+            Order, Order.id == OrderItem.order_id
+        ).where(
+            Order.is_deleted == False,
+            Order.status.in_(valid_statuses),
+            or_(*ranges)
+        )
+
+    window = _materialized_window(start_date, end_date, 'ventes_articles_par_jour_mv')
+    if not window:
+        return live(and_(Order.created_at >= start_date, Order.created_at <= end_date)).subquery('lignes')
+
+    first_full_day, cutoff = window
+    return union_all(
+        select(
+            ventes_articles_par_jour_mv.c.product_id,
+            ventes_articles_par_jour_mv.c.quantity,
+            ventes_articles_par_jour_mv.c.prix_total
+        ).where(
+            ventes_articles_par_jour_mv.c.jour >= first_full_day.date(),
+            ventes_articles_par_jour_mv.c.jour < cutoff.date()
+        ),
+        live(
+            and_(Order.created_at >= start_date, Order.created_at < first_full_day),
+            and_(Order.created_at >= cutoff, Order.created_at <= end_date)
+        )
+    ).subquery('lignes')
 
 
 class DashboardService:
     """Service pour les indicateurs du dashboard"""
 
+    @staticmethod
+    def mark_etat_stocks_dirty(session):
+        """
+        Invalide l'état des stocks au prochain commit de la session.
+        À appeler après un UPDATE direct sur products / stocks (aucun objet flushé).
+        """
+        session.info[_ETAT_STOCKS_DIRTY] = True
+
     @staticmethod
     def get_chiffre_affaires(start_date, end_date):
         """
@@ -43,6 +259,10 @@ class DashboardService:
     def get_ventes_par_jour(start_date, end_date):
         """
         Retourne les ventes groupées par jour.
+        Les jours complets couverts par le dernier rafraîchissement de la vue
+        matérialisée ventes_par_jour_mv (si activée) y sont lus, le reste (jours
+        partiels en bordure de période, jours non rafraîchis, aujourd'hui) est
+        agrégé sur la table orders.
         """
         valid_statuses = [
             OrderStatus.CONFIRMEE.value,
@@ -51,30 +271,77 @@ class DashboardService:
             OrderStatus.LIVREE.value
         ]
 
-        results = db.session.query(
-            func.date(Order.created_at).label('date'),
-            func.sum(Order.montant_total).label('total'),
-            func.count(Order.id).label('nombre_commandes')
-        ).filter(
-            Order.is_deleted == False,
-            Order.status.in_(valid_statuses),
-            Order.created_at >= start_date,
-            Order.created_at <= end_date
-        ).group_by(
-            func.date(Order.created_at)
-        ).order_by(
-            func.date(Order.created_at)
-        ).all()
+        def live(*ranges):
+            day = func.date(Order.created_at)
+            return select(
+                day.label('date'),
+                func.sum(Order.montant_total).label('total'),
+                func.count(Order.id).label('nombre_commandes')
+            ).where(
+                Order.is_deleted == False,
+                Order.status.in_(valid_statuses),
+                or_(*ranges)
+            ).group_by(day)
+
+        window = _materialized_window(start_date, end_date, 'ventes_par_jour_mv')
+
+        if window:
+            first_full_day, cutoff = window
+            stmt = union_all(
+                select(
+                    ventes_par_jour_mv.c.jour.label('date'),
+                    ventes_par_jour_mv.c.total,
+                    ventes_par_jour_mv.c.nombre_commandes
+                ).where(
+                    ventes_par_jour_mv.c.jour >= first_full_day.date(),
+                    ventes_par_jour_mv.c.jour < cutoff.date()
+                ),
+                live(
+                    and_(Order.created_at >= start_date, Order.created_at < first_full_day),
+                    and_(Order.created_at >= cutoff, Order.created_at <= end_date)
+                )
+            )
+            ventes = stmt.subquery()
+            stmt = select(ventes).order_by(ventes.c.date)
+        else:
+            stmt = live(
+                and_(Order.created_at >= start_date, Order.created_at <= end_date)
+            ).order_by(func.date(Order.created_at))
+
+        results = db.session.execute(stmt).all()
 
         return [
             {
-                'date': str(r.date),
+                'date': r.date,
                 'total': float(r.total) if r.total else 0,
                 'nombre_commandes': r.nombre_commandes
             }
             for r in results
         ]
 
+    @staticmethod
+    def refresh_materialized_views():
+        """
+        Rafraîchit les vues matérialisées du dashboard (tâche planifiée, ex: cron nocturne).
+        CONCURRENTLY: les lectures ne sont pas bloquées pendant le rafraîchissement.
+        Enregistre pour chaque vue le premier jour non couvert (aujourd'hui, pris
+        avant le rafraîchissement): les jours suivants restent lus sur orders.
+        """
+        now = datetime.utcnow()
+        for view in DASHBOARD_MATERIALIZED_VIEWS:
+            db.session.execute(text(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {view}'))
+            stmt = pg_insert(dashboard_views_refresh).values(
+                view_name=view,
+                refreshed_until=now.date(),
+                refreshed_at=now
+            )
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=['view_name'],
+                set_={'refreshed_until': stmt.excluded.refreshed_until, 'refreshed_at': stmt.excluded.refreshed_at}
+            ))
+        db.session.commit()
+        views_refresh_cache.clear()
+
     @staticmethod
     def get_nombre_commandes(start_date, end_date, status=None):
         """
@@ -107,11 +374,28 @@ class DashboardService:
 
         return {r.status: r.count for r in results}
 
+    @staticmethod
+    def get_commandes_stats(start_date, end_date):
+        """
+        Retourne (total, {statut: nombre}) en une seule requête:
+        le total est la somme des décomptes par statut (mêmes filtres).
+        """
+        par_statut = DashboardService.get_commandes_par_statut(start_date, end_date)
+        return sum(par_statut.values()), par_statut
+
     @staticmethod
     def get_details_commandes_par_jour(start_date, end_date):
         """
         Retourne les détails des commandes par jour avec les articles.
         """
+        return list(DashboardService.iter_details_commandes_par_jour(start_date, end_date))
+
+    @staticmethod
+    def iter_details_commandes_par_jour(start_date, end_date, batch_size=500):
+        """
+        Générateur des détails des commandes, un dict par jour (du plus récent au plus ancien).
+        Les commandes sont lues par lots (yield_per): la mémoire reste bornée à un jour.
+        """
         valid_statuses = [
             OrderStatus.CONFIRMEE.value,
             OrderStatus.EN_PREPARATION.value,
@@ -119,61 +403,74 @@ class DashboardService:
             OrderStatus.LIVREE.value
         ]
 
-        orders = Order.query.filter(
+        # selectinload: le chargement joint des collections est incompatible avec yield_per
+        orders = Order.query.options(
+            selectinload(Order.items).selectinload(OrderItem.product).selectinload(Product.category),
+            selectinload(Order.livreur)
+        ).filter(
             Order.is_deleted == False,
             Order.status.in_(valid_statuses),
             Order.created_at >= start_date,
             Order.created_at <= end_date
-        ).order_by(Order.created_at.desc()).all()
+        ).order_by(Order.created_at.desc()).yield_per(batch_size)
 
-        # Grouper par jour
-        by_day = {}
+        # Commandes triées par date: les jours arrivent groupés
+        current = None
         for order in orders:
-            day = order.created_at.strftime('%Y-%m-%d')
-            if day not in by_day:
-                by_day[day] = {
+            day = order.created_at.date().isoformat()
+            if current is None or current['date'] != day:
+                if current is not None:
+                    yield current
+                current = {
                     'date': day,
                     'commandes': [],
                     'total': 0,
                     'nombre': 0
                 }
-            by_day[day]['commandes'].append(order.to_dict(include_items=True))
-            by_day[day]['total'] += float(order.montant_total)
-            by_day[day]['nombre'] += 1
+            current['commandes'].append(order.to_dict(include_items=True))
+            current['total'] += float(order.montant_total)
+            current['nombre'] += 1
 
-        return list(by_day.values())
+        if current is not None:
+            yield current
 
     @staticmethod
-    def get_ventes_par_article(start_date, end_date, limit=10):
+    def _ventes_par_article_query(start_date, end_date, limit):
         """
-        Retourne les ventes par article (top vendus).
+        Requête des ventes par article (top vendus).
+        Top-N calculé sur les seuls product_id (ORDER BY/LIMIT en SQL),
+        puis jointure des produits sur les `limit` lignes retenues.
         """
-        valid_statuses = [
-            OrderStatus.CONFIRMEE.value,
-            OrderStatus.EN_PREPARATION.value,
-            OrderStatus.EN_LIVRAISON.value,
-            OrderStatus.LIVREE.value
-        ]
+        lignes = _lignes_vendues(start_date, end_date)
+        quantity_sold = func.sum(lignes.c.quantity)
 
-        results = db.session.query(
+        top = select(
+            lignes.c.product_id,
+            quantity_sold.label('quantity_sold'),
+            func.sum(lignes.c.prix_total).label('total_revenue')
+        ).group_by(
+            lignes.c.product_id
+        ).order_by(
+            quantity_sold.desc(), lignes.c.product_id
+        ).limit(limit).subquery('top')
+
+        return db.session.query(
             Product.id,
             Product.nom,
-            func.sum(OrderItem.quantity).label('quantity_sold'),
-            func.sum(OrderItem.prix_total).label('total_revenue')
+            top.c.quantity_sold,
+            top.c.total_revenue
         ).join(
-            OrderItem, OrderItem.product_id == Product.id
-        ).join(
-            Order, Order.id == OrderItem.order_id
-        ).filter(
-            Order.is_deleted == False,
-            Order.status.in_(valid_statuses),
-            Order.created_at >= start_date,
-            Order.created_at <= end_date
-        ).group_by(
-            Product.id, Product.nom
+            top, top.c.product_id == Product.id
         ).order_by(
-            func.sum(OrderItem.quantity).desc()
-        ).limit(limit).all()
+            top.c.quantity_sold.desc(), Product.id
+        )
+
+    @staticmethod
+    def get_ventes_par_article(start_date, end_date, limit=10):
+        """
+        Retourne les ventes par article (top vendus).
+        """
+        results = DashboardService._ventes_par_article_query(start_date, end_date, limit).all()
 
         return [
             {
@@ -186,38 +483,51 @@ class DashboardService:
         ]
 
     @staticmethod
-    def get_ventes_par_categorie(start_date, end_date):
+    def get_ventes_par_article_json(start_date, end_date, limit=10):
         """
-        Retourne les ventes groupées par catégorie.
+        Ventes par article déjà encodées en JSON (str).
+        PostgreSQL construit le tableau (json_agg): aucune ligne matérialisée en Python.
         """
-        valid_statuses = [
-            OrderStatus.CONFIRMEE.value,
-            OrderStatus.EN_PREPARATION.value,
-            OrderStatus.EN_LIVRAISON.value,
-            OrderStatus.LIVREE.value
-        ]
+        if db.engine.dialect.name != 'postgresql':
+            return current_app.json.dumps(DashboardService.get_ventes_par_article(start_date, end_date, limit))
+
+        rows = DashboardService._ventes_par_article_query(start_date, end_date, limit).subquery()
+        return _json_agg(
+            func.json_build_object(
+                'product_id', rows.c.id,
+                'product_nom', rows.c.nom,
+                'quantity_sold', func.coalesce(rows.c.quantity_sold, 0),
+                'total_revenue', func.coalesce(rows.c.total_revenue, 0)
+            ),
+            rows.c.quantity_sold.desc()
+        )
 
-        results = db.session.query(
+    @staticmethod
+    def _ventes_par_categorie_query(start_date, end_date):
+        """Requête des ventes groupées par catégorie"""
+        lignes = _lignes_vendues(start_date, end_date)
+
+        return db.session.query(
             Category.id,
             Category.nom,
-            func.sum(OrderItem.quantity).label('quantity_sold'),
-            func.sum(OrderItem.prix_total).label('total_revenue')
+            func.sum(lignes.c.quantity).label('quantity_sold'),
+            func.sum(lignes.c.prix_total).label('total_revenue')
         ).join(
             Product, Product.category_id == Category.id
         ).join(
-            OrderItem, OrderItem.product_id == Product.id
-        ).join(
-            Order, Order.id == OrderItem.order_id
-        ).filter(
-            Order.is_deleted == False,
-            Order.status.in_(valid_statuses),
-            Order.created_at >= start_date,
-            Order.created_at <= end_date
+            lignes, lignes.c.product_id == Product.id
         ).group_by(
             Category.id, Category.nom
         ).order_by(
-            func.sum(OrderItem.prix_total).desc()
-        ).all()
+            func.sum(lignes.c.prix_total).desc()
+        )
+
+    @staticmethod
+    def get_ventes_par_categorie(start_date, end_date):
+        """
+        Retourne les ventes groupées par catégorie.
+        """
+        results = DashboardService._ventes_par_categorie_query(start_date, end_date).all()
 
         return [
             {
@@ -229,11 +539,36 @@ class DashboardService:
             for r in results
         ]
 
+    @staticmethod
+    def get_ventes_par_categorie_json(start_date, end_date):
+        """
+        Ventes par catégorie déjà encodées en JSON (str), construites par PostgreSQL (json_agg).
+        """
+        if db.engine.dialect.name != 'postgresql':
+            return current_app.json.dumps(DashboardService.get_ventes_par_categorie(start_date, end_date))
+
+        rows = DashboardService._ventes_par_categorie_query(start_date, end_date).subquery()
+        return _json_agg(
+            func.json_build_object(
+                'category_id', rows.c.id,
+                'category_nom', rows.c.nom,
+                'quantity_sold', func.coalesce(rows.c.quantity_sold, 0),
+                'total_revenue', func.coalesce(rows.c.total_revenue, 0)
+            ),
+            rows.c.total_revenue.desc()
+        )
+
     @staticmethod
     def get_etat_stocks():
         """
         Retourne l'état des stocks (ruptures, faibles stocks).
+        Mis en cache (60s, invalidé au commit): le dict est partagé, ne pas le modifier.
         """
+        return etat_stocks_cache.get_or_set(ETAT_STOCKS_KEY, DashboardService._compute_etat_stocks)
+
+    @staticmethod
+    def _compute_etat_stocks():
+        """Calcule l'état des stocks depuis la base"""
         stocks = db.session.query(
             Stock, Product
         ).join(
@@ -276,7 +611,7 @@ class DashboardService:
     @staticmethod
     def get_panier_moyen(start_date, end_date):
         """
-        Calcule le panier moyen sur une période.
+        Calcule le panier moyen sur une période (arrondi à 2 décimales par la base).
         """
         valid_statuses = [
             OrderStatus.CONFIRMEE.value,
@@ -286,7 +621,7 @@ class DashboardService:
         ]
 
         result = db.session.query(
-            func.avg(Order.montant_total)
+            func.round(func.avg(Order.montant_total), 2)
         ).filter(
             Order.is_deleted == False,
             Order.status.in_(valid_statuses),
@@ -300,20 +635,59 @@ class DashboardService:
     def get_kpis_avances(start_date, end_date):
         """
         Retourne les KPIs avancés.
+        Tous les agrégats scalaires (période courante, période précédente,
+        alertes stock) sont calculés en une seule requête (FILTER par agrégat).
+        Le top articles reste une seconde requête.
         """
-        ca_total = DashboardService.get_chiffre_affaires(start_date, end_date)
-        nb_commandes = DashboardService.get_nombre_commandes(start_date, end_date)
-        panier_moyen = DashboardService.get_panier_moyen(start_date, end_date)
-        top_articles = DashboardService.get_ventes_par_article(start_date, end_date, limit=5)
-        etat_stocks = DashboardService.get_etat_stocks()
+        valid_statuses = [
+            OrderStatus.CONFIRMEE.value,
+            OrderStatus.EN_PREPARATION.value,
+            OrderStatus.EN_LIVRAISON.value,
+            OrderStatus.LIVREE.value
+        ]
 
         # Calcul période précédente pour comparaison
         delta = end_date - start_date
         previous_start = start_date - delta
         previous_end = start_date
 
-        ca_precedent = DashboardService.get_chiffre_affaires(previous_start, previous_end)
-        nb_commandes_precedent = DashboardService.get_nombre_commandes(previous_start, previous_end)
+        is_valid = Order.status.in_(valid_statuses)
+        in_current = and_(Order.created_at >= start_date, Order.created_at <= end_date)
+        in_previous = and_(Order.created_at >= previous_start, Order.created_at <= previous_end)
+
+        stocks_actifs = db.session.query(func.count(Stock.id)).join(
+            Product, Product.id == Stock.product_id
+        ).filter(
+            Product.is_deleted == False,
+            Product.is_active == True
+        )
+        nb_ruptures = stocks_actifs.filter(Stock.quantity <= 0).scalar_subquery()
+        nb_faibles = stocks_actifs.filter(
+            Stock.quantity > 0,
+            Stock.quantity <= Stock.seuil_alerte
+        ).scalar_subquery()
+
+        row = db.session.query(
+            func.coalesce(func.sum(Order.montant_total).filter(and_(is_valid, in_current)), 0).label('ca'),
+            func.count(Order.id).filter(in_current).label('nb_commandes'),
+            func.avg(Order.montant_total).filter(and_(is_valid, in_current)).label('panier_moyen'),
+            func.coalesce(func.sum(Order.montant_total).filter(and_(is_valid, in_previous)), 0).label('ca_precedent'),
+            func.count(Order.id).filter(in_previous).label('nb_commandes_precedent'),
+            nb_ruptures.label('ruptures'),
+            nb_faibles.label('faibles')
+        ).filter(
+            Order.is_deleted == False,
+            Order.created_at >= previous_start,
+            Order.created_at <= end_date
+        ).one()
+
+        ca_total = float(row.ca)
+        ca_precedent = float(row.ca_precedent)
+        nb_commandes = row.nb_commandes or 0
+        nb_commandes_precedent = row.nb_commandes_precedent or 0
+        panier_moyen = float(row.panier_moyen) if row.panier_moyen else 0
+
+        top_articles = DashboardService.get_ventes_par_article(start_date, end_date, limit=5)
 
         # Évolution en %
         evolution_ca = ((ca_total - ca_precedent) / ca_precedent * 100) if ca_precedent > 0 else 0
@@ -333,7 +707,7 @@ class DashboardService:
             'panier_moyen': round(panier_moyen, 2),
             'top_articles': top_articles,
             'alertes_stock': {
-                'ruptures': etat_stocks['stats']['total_ruptures'],
-                'faibles': etat_stocks['stats']['total_faibles']
+                'ruptures': row.ruptures or 0,
+                'faibles': row.faibles or 0
             }
         }
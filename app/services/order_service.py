@@ -1,15 +1,201 @@
 """
 Service Order - Gestion des commandes et workflow
 """
+from datetime import datetime
+from itertools import chain
+
+from flask import current_app
+from sqlalchemy import event, update, select, func, cast, literal_column, Float, Text
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array
+from sqlalchemy.orm import Session, selectinload, joinedload
+
 from app.extensions import db
 from app.models.order import Order, OrderItem, OrderStatus, TypePaiement
 from app.models.product import Product
+from app.schemas.order import OrderSchema
 from app.services.stock_service import StockService
+from app.core.cache import TTLCache
+from app.core.audit_mixin import get_current_user_id
+
+
+# Comptage par statut (badges de l'UI, interrogés en boucle): invalidé après tout
+# commit modifiant une commande (le TTL couvre les autres workers)
+order_counts_cache = TTLCache(ttl=10)
+ORDER_COUNTS_KEY = 'order_counts'
+# Marqueur de transaction (session.info): passer par OrderService.mark_counts_dirty
+_ORDER_COUNTS_DIRTY = 'order_counts_dirty'
+
+# Sérialisation des listes hors PostgreSQL (orders_json), construite une seule fois
+orders_schema = OrderSchema(many=True)
+
+# Statuts dont l'annulation remet les articles en stock
+_STOCK_RESERVED_STATUSES = frozenset({OrderStatus.CONFIRMEE, OrderStatus.EN_PREPARATION, OrderStatus.EN_LIVRAISON})
+# Statuts autorisant la suppression (logique) d'une commande
+_DELETABLE_STATUSES = frozenset({OrderStatus.BROUILLON.value, OrderStatus.ANNULEE.value})
+# Statuts où le paiement est refusé
+_UNPAYABLE_STATUSES = frozenset({OrderStatus.BROUILLON.value, OrderStatus.ANNULEE.value})
+
+
+@event.listens_for(Session, 'after_flush')
+def track_order_changes(session, flush_context):
+    """Marque la transaction si elle touche aux commandes"""
+    if any(isinstance(obj, Order) for obj in chain(session.new, session.dirty, session.deleted)):
+        OrderService.mark_counts_dirty(session)
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_order_counts(session):
+    """Invalide le comptage par statut une fois la transaction validée"""
+    if session.info.pop(_ORDER_COUNTS_DIRTY, False):
+        order_counts_cache.delete(ORDER_COUNTS_KEY)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def reset_order_changes(session, previous_transaction):
+    session.info.pop(_ORDER_COUNTS_DIRTY, None)
 
 
 class OrderService:
     """Service pour la gestion des commandes"""
 
+    @staticmethod
+    def mark_counts_dirty(session):
+        """
+        Invalide le comptage par statut au prochain commit de la session.
+        À appeler après un UPDATE direct sur orders (aucun objet flushé).
+        """
+        session.info[_ORDER_COUNTS_DIRTY] = True
+
+    @staticmethod
+    def get_status_counts():
+        """
+        Nombre de commandes non supprimées par statut (tous les statuts présents, 0 par défaut).
+        Mis en cache (10s, invalidé au commit): le dict est partagé, ne pas le modifier.
+        """
+        return order_counts_cache.get_or_set(ORDER_COUNTS_KEY, OrderService._compute_status_counts)
+
+    @staticmethod
+    def orders_json(order_ids):
+        """
+        Liste de commandes (même contenu que OrderSchema(many=True).dump) déjà encodée
+        en JSON (str), dans l'ordre de order_ids. PostgreSQL construit les objets
+        (json_build_object / json_agg): aucun objet ORM ni dump Marshmallow.
+        """
+        if not order_ids:
+            return '[]'
+
+        if db.engine.dialect.name != 'postgresql':
+            orders = Order.query.options(
+                selectinload(Order.items).joinedload(OrderItem.product).joinedload(Product.category),
+                joinedload(Order.livreur)
+            ).filter(Order.id.in_(order_ids)).all()
+            by_id = {o.id: o for o in orders}
+            return current_app.json.dumps(orders_schema.dump([by_id[i] for i in order_ids if i in by_id]))
+
+        from app.models.user import User
+
+        def number(col):
+            return cast(col, Float)
+
+        empty = literal_column("'[]'::json")
+
+        product = select(func.json_build_object(
+            'id', Product.id,
+            'nom', Product.nom,
+            'description', Product.description,
+            'sku', Product.sku,
+            'photo_url', Product.photo_url,
+            'category_id', Product.category_id,
+            'is_active', Product.is_active
+        )).where(Product.id == OrderItem.product_id).scalar_subquery()
+
+        item = func.json_build_object(
+            'id', OrderItem.id,
+            'order_id', OrderItem.order_id,
+            'product_id', OrderItem.product_id,
+            'quantity', OrderItem.quantity,
+            'prix_unitaire', number(OrderItem.prix_unitaire),
+            'prix_total', number(OrderItem.prix_total),
+            'created_at', OrderItem.created_at,
+            'product', product
+        )
+        items = select(
+            func.coalesce(func.json_agg(aggregate_order_by(item, OrderItem.id)), empty)
+        ).where(OrderItem.order_id == Order.id).scalar_subquery()
+        items_count = select(func.count()).where(OrderItem.order_id == Order.id).scalar_subquery()
+
+        livreur = select(func.json_build_object(
+            'id', User.id,
+            'nom', User.nom,
+            'prenom', User.prenom,
+            'telephone', User.telephone
+        )).where(User.id == Order.livreur_id).scalar_subquery()
+
+        order = func.json_build_object(
+            'id', Order.id,
+            'numero', Order.numero,
+            'status', Order.status,
+            'client_nom', Order.client_nom,
+            'client_telephone', Order.client_telephone,
+            'client_email', Order.client_email,
+            'adresse_livraison', Order.adresse_livraison,
+            'repere', Order.repere,
+            'montant_total', number(Order.montant_total),
+            'montant_remise', number(Order.montant_remise),
+            'montant_livraison', number(Order.montant_livraison),
+            'date_confirmation', Order.date_confirmation,
+            'date_paiement', Order.date_paiement,
+            'date_preparation', Order.date_preparation,
+            'date_expedition', Order.date_expedition,
+            'date_livraison', Order.date_livraison,
+            'notes', Order.notes,
+            'motif_annulation', Order.motif_annulation,
+            'type_paiement', Order.type_paiement,
+            'mobile_money_numero', Order.mobile_money_numero,
+            'mobile_money_ref', Order.mobile_money_ref,
+            'montant_paye', number(Order.montant_paye),
+            'user_id', Order.user_id,
+            'livreur_id', Order.livreur_id,
+            'livreur', livreur,
+            'items', items,
+            'items_count', items_count,
+            'est_paye', Order.date_paiement.isnot(None),
+            'created_at', Order.created_at,
+            'updated_at', Order.updated_at,
+            'created_by', Order.created_by,
+            'updated_by', Order.updated_by
+        )
+
+        # Cast en texte: psycopg2 décoderait sinon le JSON en objets Python
+        stmt = select(cast(
+            func.coalesce(
+                func.json_agg(aggregate_order_by(order, func.array_position(array(order_ids), Order.id))),
+                empty
+            ),
+            Text
+        )).where(Order.id.in_(order_ids))
+
+        return db.session.execute(stmt).scalar()
+
+    @staticmethod
+    def _compute_status_counts():
+        """Compte les commandes par statut (un seul GROUP BY)"""
+        counts = dict.fromkeys((status.value for status in OrderStatus), 0)
+
+        status_counts = db.session.query(
+            Order.status,
+            db.func.count()
+        ).filter(
+            Order.is_deleted == False
+        ).group_by(
+            Order.status
+        ).all()
+
+        for status, count in status_counts:
+            counts[status] = count
+
+        return counts
+
     @staticmethod
     def create_order(data, user_id=None):
         """
@@ -70,6 +256,8 @@ class OrderService:
 
         if 'livreur_id' in data:
             order.livreur_id = data['livreur_id']
+            # Relation déjà chargée: la relire au prochain accès (les objets n'expirent plus au commit)
+            db.session.expire(order, ['livreur'])
 
         order.calculate_total()
 
@@ -87,30 +275,62 @@ class OrderService:
         if not product:
             raise ValueError("Produit non trouvé")
 
-        # Vérifier si l'article existe déjà
-        existing_item = OrderItem.query.filter_by(
-            order_id=order.id,
-            product_id=product_id
-        ).first()
+        # Vérifier si l'article existe déjà (lignes chargées avec la commande)
+        existing_item = next((i for i in order.items if i.product_id == product_id), None)
 
         if existing_item:
             existing_item.quantity += quantity
             existing_item.calculate_total()
         else:
+            # Ajout par la collection: order.items reste à jour pour le total et la réponse
             item = OrderItem(
-                order_id=order.id,
-                product_id=product_id,
+                product=product,
                 quantity=quantity,
                 prix_unitaire=product.prix
             )
             item.calculate_total()
-            db.session.add(item)
+            order.items.append(item)
 
         db.session.flush()
         order.calculate_total()
 
         return order
 
+    @staticmethod
+    def soft_delete_order(order_id):
+        """
+        Suppression logique en un seul UPDATE ... RETURNING, sans charger la commande.
+        Retourne True si supprimée, sinon lève LookupError (absente) ou ValueError (statut).
+        """
+        now = datetime.utcnow()
+        user_id = get_current_user_id()
+
+        # L'UPDATE direct ne déclenche pas les listeners d'audit: renseigner les champs ici
+        deleted_id = db.session.execute(
+            update(Order)
+            .where(
+                Order.id == order_id,
+                Order.is_deleted == False,
+                Order.status.in_(_DELETABLE_STATUSES)
+            )
+            .values(is_deleted=True, deleted_at=now, deleted_by=user_id, updated_at=now, updated_by=user_id)
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+
+        if deleted_id is None:
+            # Échec uniquement: une lecture pour distinguer 404 et 400
+            exists = db.session.execute(
+                select(Order.id).where(Order.id == order_id, Order.is_deleted == False)
+            ).scalar()
+            if exists is None:
+                raise LookupError("Commande non trouvée")
+            raise ValueError("Seules les commandes en brouillon ou annulées peuvent être supprimées")
+
+        # Pas d'objet Order dans la session: signaler le changement au cache des compteurs
+        OrderService.mark_counts_dirty(db.session)
+        return True
+
     @staticmethod
     def remove_item_from_order(order, item_id):
         """
@@ -119,12 +339,14 @@ class OrderService:
         if order.status != OrderStatus.BROUILLON.value:
             raise ValueError("Seules les commandes en brouillon peuvent être modifiées")
 
-        item = OrderItem.query.filter_by(id=item_id, order_id=order.id).first()
+        # Lignes déjà chargées avec la commande: pas de SELECT
+        item = next((i for i in order.items if i.id == item_id), None)
         if not item:
             raise ValueError("Article non trouvé")
 
-        db.session.delete(item)
-        db.session.flush()
+        # Retrait de la collection (delete-orphan): DELETE au flush et
+        # total recalculé sur les lignes restantes
+        order.items.remove(item)
         order.calculate_total()
 
         return order
@@ -165,7 +387,7 @@ class OrderService:
         target_status = OrderStatus(new_status) if isinstance(new_status, str) else new_status
 
         if target_status == OrderStatus.ANNULEE:
-            if current_status in [OrderStatus.CONFIRMEE, OrderStatus.EN_PREPARATION, OrderStatus.EN_LIVRAISON]:
+            if current_status in _STOCK_RESERVED_STATUSES:
                 # Retourner les stocks
                 StockService.return_stock_for_order(order)
 
@@ -196,8 +418,7 @@ class OrderService:
         from datetime import datetime
 
         # Vérifier que la commande peut être payée
-        forbidden_statuses = [OrderStatus.BROUILLON.value, OrderStatus.ANNULEE.value]
-        if order.status in forbidden_statuses:
+        if order.status in _UNPAYABLE_STATUSES:
             raise ValueError(f"Impossible de payer une commande en statut {order.status}")
 
         # Vérifier si déjà payée
@@ -231,12 +452,21 @@ class OrderService:
     def assign_livreur(order, livreur_id):
         """
         Assigne un livreur à une commande.
+        Une seule lecture (id, rôle et statut vérifiés dans le WHERE): le livreur
+        chargé est attaché à la commande et sert directement la réponse.
         """
         from app.models.user import User
-        livreur = User.query.filter_by(id=livreur_id, role='livreur', is_active=True).first()
+        livreur = db.session.execute(
+            select(User).where(
+                User.id == livreur_id,
+                User.role == 'livreur',
+                User.is_active == True,
+                User.is_deleted == False
+            )
+        ).scalar()
 
         if not livreur:
             raise ValueError("Livreur non trouvé ou inactif")
 
-        order.livreur_id = livreur_id
+        order.livreur = livreur
         return order
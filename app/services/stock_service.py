@@ -146,27 +146,20 @@ class StockService:
         return query.order_by(StockMovement.created_at.desc()).limit(limit).all()
 
     @staticmethod
-    def get_low_stock_products():
+    def get_stock_alerts():
         """
-        Récupère les produits en stock faible.
+        Produits en alerte (stock faible ou rupture) en une seule requête, colonnes seules.
+        Retourne des lignes (product_id, product_nom, quantity, seuil_alerte).
         """
-        return db.session.query(Product, Stock).join(
+        return db.session.query(
+            Product.id.label('product_id'),
+            Product.nom.label('product_nom'),
+            Stock.quantity,
+            Stock.seuil_alerte
+        ).join(
             Stock, Stock.product_id == Product.id
         ).filter(
             Product.is_deleted == False,
             Product.is_active == True,
-            Stock.quantity <= Stock.seuil_alerte
-        ).all()
-
-    @staticmethod
-    def get_out_of_stock_products():
-        """
-        Récupère les produits en rupture de stock.
-        """
-        return db.session.query(Product, Stock).join(
-            Stock, Stock.product_id == Product.id
-        ).filter(
-            Product.is_deleted == False,
-            Product.is_active == True,
-            Stock.quantity <= 0
+            db.or_(Stock.quantity <= Stock.seuil_alerte, Stock.quantity <= 0)
         ).all()
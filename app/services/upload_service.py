@@ -84,9 +84,15 @@ class UploadService:
         # Chemin complet du fichier
         filepath = os.path.join(upload_path, new_filename)
 
-        # Ouvrir et traiter l'image avec Pillow
+        # Ouvrir et traiter l'image avec Pillow (lecture paresseuse: en-tête seulement)
         image = Image.open(file.stream)
 
+        # JPEG: décodage directement à une échelle réduite (1/2, 1/4, 1/8) proche de la taille
+        # cible, avant le redimensionnement fin: moins de mémoire et de temps de décodage
+        max_size = current_app.config.get('MAX_IMAGE_SIZE', (800, 800))
+        if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
+            image.draft('RGB', max_size)
+
         # Convertir en RGB si nécessaire (pour les PNG avec transparence)
         if image.mode in ('RGBA', 'LA', 'P'):
             background = Image.new('RGB', image.size, (255, 255, 255))
@@ -96,12 +102,11 @@ class UploadService:
             image = background
 
         # Redimensionner si trop grande
-        max_size = current_app.config.get('MAX_IMAGE_SIZE', (800, 800))
         if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
             image = UploadService.resize_image(image, max_size)
 
         # Sauvegarder l'image principale
-        image.save(filepath, quality=85, optimize=True)
+        image.save(filepath, quality=85, optimize=True, progressive=True)
 
         # Calculer la taille du fichier
         file_size = os.path.getsize(filepath)
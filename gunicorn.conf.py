@@ -0,0 +1,17 @@
+"""
+Configuration gunicorn (production), chargée automatiquement depuis la racine du projet:
+    gunicorn "app:create_app()"
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Workers à threads: pendant une attente base (psycopg2 libère le GIL), les autres
+# threads du worker continuent de servir des requêtes
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Chaque thread peut tenir une connexion: garder SQLALCHEMY_POOL_SIZE >= threads
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
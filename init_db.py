@@ -11,6 +11,15 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from app.app import create_app
 from app.extensions import db
 from app.models import User, Category, Product, Stock, StockMovement, Order, OrderItem
+from app.services.dashboard_service import DashboardService, DASHBOARD_MATERIALIZED_VIEWS
+
+# Vues matérialisées du dashboard et suivi de leur rafraîchissement (hors create_all)
+DASHBOARD_VIEW_MIGRATIONS = (
+    '009_add_ventes_par_jour_mv.sql',
+    '011_add_ventes_articles_par_jour_mv.sql',
+    '012_add_ventes_articles_par_jour_mv_covering_index.sql',
+    '021_add_dashboard_views_refresh.sql'
+)
 
 
 def init_database():
@@ -41,6 +50,14 @@ def init_database():
             print("Produits créés!")
 
         db.session.commit()
+
+        if db.engine.dialect.name == 'postgresql':
+            print("Création des vues matérialisées du dashboard...")
+            create_dashboard_views()
+            print("Vues créées et rafraîchies!")
+            print("  Planifier `flask refresh-dashboard-views` chaque nuit, puis")
+            print("  activer DASHBOARD_USE_MATERIALIZED_VIEWS=true")
+
         print("\nBase de données initialisée avec succès!")
         print("\nUtilisateurs créés:")
         print("  - admin@example.com / admin123 (admin)")
@@ -49,6 +66,19 @@ def init_database():
         print("  - user@example.com / user123 (simple_utilisateur)")
 
 
+def create_dashboard_views():
+    """Crée les vues matérialisées du dashboard (migrations SQL) et les rafraîchit une première fois."""
+    migrations_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+    with db.engine.begin() as connection:
+        connection = connection.execution_options(no_parameters=True)
+        for filename in DASHBOARD_VIEW_MIGRATIONS:
+            with open(os.path.join(migrations_dir, filename), encoding='utf-8') as f:
+                connection.exec_driver_sql(f.read())
+
+    DashboardService.refresh_materialized_views()
+
+
 def create_default_users():
     """Crée les utilisateurs par défaut."""
     users_data = [
@@ -185,6 +215,12 @@ def reset_database():
 
     with app.app_context():
         print("Suppression des tables...")
+        if db.engine.dialect.name == 'postgresql':
+            # Les vues matérialisées dépendent de orders / order_items
+            with db.engine.begin() as connection:
+                for view in DASHBOARD_MATERIALIZED_VIEWS:
+                    connection.exec_driver_sql(f'DROP MATERIALIZED VIEW IF EXISTS {view}')
+                connection.exec_driver_sql('DROP TABLE IF EXISTS dashboard_views_refresh')
         db.drop_all()
         print("Tables supprimées!")
         init_database()
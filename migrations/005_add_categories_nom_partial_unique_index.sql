@@ -0,0 +1,16 @@
+-- ==============================================
+-- Migration 005: Unicité du nom de catégorie limitée aux catégories actives
+-- Date: 2026-10-15
+-- ==============================================
+
+-- ==============================================
+-- 1. Remplacement de la contrainte UNIQUE globale par un index unique partiel
+-- ==============================================
+
+-- La contrainte globale empêchait de réutiliser le nom d'une catégorie supprimée
+ALTER TABLE categories DROP CONSTRAINT IF EXISTS categories_nom_key;
+
+-- Index unique partiel: sert aussi au contrôle d'existence (index-only scan)
+CREATE UNIQUE INDEX IF NOT EXISTS ix_categories_nom_active ON categories(nom) WHERE is_deleted = false;
+
+COMMENT ON INDEX ix_categories_nom_active IS 'Unicité du nom parmi les catégories non supprimées';
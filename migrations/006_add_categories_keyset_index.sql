@@ -0,0 +1,9 @@
+-- ==============================================
+-- Migration 006: Index pour la pagination par curseur des catégories
+-- Date: 2026-10-15
+-- ==============================================
+
+-- Index composite sur la clé de tri (ordre, nom, id) des catégories non supprimées
+CREATE INDEX IF NOT EXISTS ix_categories_ordre_nom_id ON categories(ordre, nom, id) WHERE is_deleted = false;
+
+COMMENT ON INDEX ix_categories_ordre_nom_id IS 'Pagination keyset de GET /categories (ORDER BY ordre, nom, id)';
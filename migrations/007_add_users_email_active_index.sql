@@ -0,0 +1,9 @@
+-- ==============================================
+-- Migration 007: Index partiel pour la recherche d'email au login
+-- Date: 2026-10-15
+-- ==============================================
+
+-- Recherche insensible à la casse parmi les utilisateurs non supprimés (un seul index seek)
+CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email_active ON users(lower(email)) WHERE is_deleted = false;
+
+COMMENT ON INDEX ix_users_email_active IS 'Login: WHERE lower(email) = ... AND is_deleted = false';
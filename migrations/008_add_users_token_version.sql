@@ -0,0 +1,10 @@
+-- ==============================================
+-- Migration 008: Version de token des utilisateurs
+-- Date: 2026-10-15
+-- ==============================================
+
+-- Incrémentée à la désactivation, suppression ou changement de rôle:
+-- les refresh tokens portant une version antérieure sont refusés
+ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN users.token_version IS 'Version des tokens JWT (claim tv), incrémentée pour forcer une reconnexion';
@@ -0,0 +1,22 @@
+-- ==============================================
+-- Migration 009: Vue matérialisée des ventes par jour
+-- Date: 2026-10-15
+-- ==============================================
+
+-- Agrégat quotidien des commandes valides (confirmee, en_preparation, en_livraison, livree).
+-- Rafraîchie chaque nuit: flask refresh-dashboard-views
+-- (REFRESH MATERIALIZED VIEW CONCURRENTLY ventes_par_jour_mv)
+CREATE MATERIALIZED VIEW IF NOT EXISTS ventes_par_jour_mv AS
+SELECT
+    date(created_at) AS jour,
+    SUM(montant_total) AS total,
+    COUNT(id) AS nombre_commandes
+FROM orders
+WHERE is_deleted = false
+  AND status IN ('confirmee', 'en_preparation', 'en_livraison', 'livree')
+GROUP BY date(created_at);
+
+-- Index unique requis par REFRESH ... CONCURRENTLY, sert aussi au filtre par période
+CREATE UNIQUE INDEX IF NOT EXISTS ix_ventes_par_jour_mv_jour ON ventes_par_jour_mv(jour);
+
+COMMENT ON MATERIALIZED VIEW ventes_par_jour_mv IS 'Ventes par jour pour /dashboard/ventes-par-jour (jours complets passés)';
@@ -0,0 +1,26 @@
+-- ==============================================
+-- Migration 010: Index pour les filtres par période du dashboard
+-- Date: 2026-10-15
+-- ==============================================
+
+-- ==============================================
+-- 1. Index BRIN sur la date de création
+-- ==============================================
+
+-- Les commandes sont insérées dans l'ordre chronologique: un BRIN (quelques pages)
+-- suffit à écarter les blocs hors période pour les scans de plage larges
+CREATE INDEX IF NOT EXISTS ix_orders_created_at_brin ON orders USING BRIN (created_at) WITH (pages_per_range = 32);
+
+COMMENT ON INDEX ix_orders_created_at_brin IS 'Scans par période (created_at BETWEEN ...) sur de larges plages';
+
+-- ==============================================
+-- 2. Index partiel couvrant des commandes valides
+-- ==============================================
+
+-- Chiffre d'affaires, panier moyen, ventes par jour: index-only scan sur la période
+CREATE INDEX IF NOT EXISTS ix_orders_valides_created_at ON orders(created_at) INCLUDE (montant_total)
+    WHERE is_deleted = false AND status IN ('confirmee', 'en_preparation', 'en_livraison', 'livree');
+
+COMMENT ON INDEX ix_orders_valides_created_at IS 'Agrégats du dashboard sur les commandes valides (confirmee à livree)';
+
+ANALYZE orders;
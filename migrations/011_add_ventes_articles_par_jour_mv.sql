@@ -0,0 +1,24 @@
+-- ==============================================
+-- Migration 011: Vue matérialisée des ventes quotidiennes par produit
+-- Date: 2026-10-15
+-- ==============================================
+
+-- Une ligne par (jour, produit) pour les commandes valides (confirmee, en_preparation, en_livraison, livree):
+-- les ventes par article / catégorie sur des jours passés n'agrègent plus les lignes de commande.
+-- Rafraîchie avec ventes_par_jour_mv: flask refresh-dashboard-views
+CREATE MATERIALIZED VIEW IF NOT EXISTS ventes_articles_par_jour_mv AS
+SELECT
+    date(o.created_at) AS jour,
+    oi.product_id,
+    SUM(oi.quantity) AS quantity,
+    SUM(oi.prix_total) AS prix_total
+FROM order_items oi
+JOIN orders o ON o.id = oi.order_id
+WHERE o.is_deleted = false
+  AND o.status IN ('confirmee', 'en_preparation', 'en_livraison', 'livree')
+GROUP BY date(o.created_at), oi.product_id;
+
+-- Index unique requis par REFRESH ... CONCURRENTLY, sert aussi au filtre par période
+CREATE UNIQUE INDEX IF NOT EXISTS ix_ventes_articles_par_jour_mv_jour_product ON ventes_articles_par_jour_mv(jour, product_id);
+
+COMMENT ON MATERIALIZED VIEW ventes_articles_par_jour_mv IS 'Ventes par jour et par produit pour /dashboard/ventes-par-article et /ventes-par-categorie';
@@ -0,0 +1,13 @@
+-- ==============================================
+-- Migration 012: Index couvrant de ventes_articles_par_jour_mv
+-- Date: 2026-10-15
+-- ==============================================
+
+-- Top-N des ventes par article: filtre sur jour, agrégat par product_id.
+-- Les colonnes agrégées en INCLUDE permettent un index-only scan de la période.
+CREATE INDEX IF NOT EXISTS ix_ventes_articles_par_jour_mv_jour_covering
+    ON ventes_articles_par_jour_mv(jour) INCLUDE (product_id, quantity, prix_total);
+
+ANALYZE ventes_articles_par_jour_mv;
+
+COMMENT ON INDEX ix_ventes_articles_par_jour_mv_jour_covering IS 'Index-only scan des ventes quotidiennes par produit sur une période (/dashboard/ventes-par-article)';
@@ -0,0 +1,10 @@
+-- ==============================================
+-- Migration 013: Index pour la pagination par curseur des commandes
+-- Date: 2026-10-15
+-- ==============================================
+
+-- Index composite sur la clé de tri (created_at, id) des commandes non supprimées
+-- (parcouru dans les deux sens: order=desc par défaut, order=asc)
+CREATE INDEX IF NOT EXISTS ix_orders_created_at_id ON orders(created_at, id) WHERE is_deleted = false;
+
+COMMENT ON INDEX ix_orders_created_at_id IS 'Pagination keyset de GET /orders (ORDER BY created_at, id)';
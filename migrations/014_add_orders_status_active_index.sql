@@ -0,0 +1,9 @@
+-- ==============================================
+-- Migration 014: Index partiel sur le statut des commandes non supprimées
+-- Date: 2026-10-15
+-- ==============================================
+
+-- GET /orders/counts: GROUP BY status sur les commandes non supprimées (index-only scan)
+CREATE INDEX IF NOT EXISTS ix_orders_status_active ON orders(status) WHERE is_deleted = false;
+
+COMMENT ON INDEX ix_orders_status_active IS 'Comptage des commandes par statut (GET /orders/counts) et filtre par statut';
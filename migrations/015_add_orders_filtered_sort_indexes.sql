@@ -0,0 +1,13 @@
+-- ==============================================
+-- Migration 015: Index des listes de commandes filtrées
+-- Date: 2026-10-15
+-- ==============================================
+
+-- GET /orders?status=...: filtre par statut, tri par date (défaut: created_at desc)
+CREATE INDEX IF NOT EXISTS ix_orders_status_created_at ON orders(status, created_at DESC) WHERE is_deleted = false;
+
+-- GET /orders?livreur_id=...: commandes d'un livreur, tri par date
+CREATE INDEX IF NOT EXISTS ix_orders_livreur_created_at ON orders(livreur_id, created_at DESC) WHERE is_deleted = false;
+
+COMMENT ON INDEX ix_orders_status_created_at IS 'Liste des commandes filtrée par statut, triée par date';
+COMMENT ON INDEX ix_orders_livreur_created_at IS 'Liste des commandes filtrée par livreur, triée par date';
@@ -0,0 +1,14 @@
+-- ==============================================
+-- Migration 016: Index trigramme pour la recherche de commandes
+-- Date: 2026-10-15
+-- ==============================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Recherche ILIKE '%...%' de GET /orders et /orders_minimal_info (paramètre search).
+-- L'expression doit rester identique à _order_search_text() (app/api/v1/orders.py).
+CREATE INDEX IF NOT EXISTS ix_orders_search_trgm ON orders USING gin (
+    (coalesce(numero, '') || ' ' || coalesce(client_nom, '') || ' ' || coalesce(client_telephone, '')) gin_trgm_ops
+) WHERE is_deleted = false;
+
+COMMENT ON INDEX ix_orders_search_trgm IS 'Recherche par sous-chaîne sur numéro, nom et téléphone du client';
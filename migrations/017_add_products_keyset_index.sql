@@ -0,0 +1,9 @@
+-- ==============================================
+-- Migration 017: Index pour la pagination par curseur des produits
+-- Date: 2026-10-15
+-- ==============================================
+
+-- Index composite sur la clé de tri par défaut (nom, id) des produits non supprimés
+CREATE INDEX IF NOT EXISTS ix_products_nom_id ON products(nom, id) WHERE is_deleted = false;
+
+COMMENT ON INDEX ix_products_nom_id IS 'Pagination keyset de GET /products (ORDER BY nom, id)';
@@ -0,0 +1,13 @@
+-- ==============================================
+-- Migration 018: Index trigramme pour la recherche de produits
+-- Date: 2026-10-15
+-- ==============================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Recherche Product.nom ILIKE '%...%' de GET /products et GET /stocks (paramètre search).
+-- Les deux listes excluent les produits supprimés: index partiel sur is_deleted = false.
+CREATE INDEX IF NOT EXISTS ix_products_nom_trgm ON products USING gin (nom gin_trgm_ops)
+    WHERE is_deleted = false;
+
+COMMENT ON INDEX ix_products_nom_trgm IS 'Recherche par sous-chaîne sur le nom du produit';
@@ -0,0 +1,16 @@
+-- ==============================================
+-- Migration 019: Unicité du SKU limitée aux produits non supprimés
+-- Date: 2026-10-15
+-- ==============================================
+
+-- ==============================================
+-- 1. Remplacement de la contrainte UNIQUE globale par un index unique partiel
+-- ==============================================
+
+-- La contrainte globale empêchait de réutiliser le SKU d'un produit supprimé
+ALTER TABLE products DROP CONSTRAINT IF EXISTS products_sku_key;
+
+-- Index unique partiel: sert aussi au contrôle d'existence (SELECT EXISTS)
+CREATE UNIQUE INDEX IF NOT EXISTS ix_products_sku_active ON products(sku) WHERE is_deleted = false;
+
+COMMENT ON INDEX ix_products_sku_active IS 'Unicité du SKU parmi les produits non supprimés';
@@ -0,0 +1,13 @@
+-- ==============================================
+-- Migration 020: Index pour la pagination par curseur des mouvements de stock
+-- Date: 2026-10-15
+-- ==============================================
+
+-- GET /stocks/movements: ORDER BY created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS ix_stock_movements_created_at_id ON stock_movements(created_at, id);
+
+-- GET /stocks/<product_id>/movements: même clé de tri pour un produit
+CREATE INDEX IF NOT EXISTS ix_stock_movements_product_created_at_id ON stock_movements(product_id, created_at, id);
+
+COMMENT ON INDEX ix_stock_movements_created_at_id IS 'Pagination keyset des mouvements de stock (ORDER BY created_at, id)';
+COMMENT ON INDEX ix_stock_movements_product_created_at_id IS 'Pagination keyset des mouvements d''un produit (ORDER BY created_at, id)';
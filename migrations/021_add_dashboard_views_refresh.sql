@@ -0,0 +1,16 @@
+-- ==============================================
+-- Migration 021: Suivi du rafraîchissement des vues matérialisées du dashboard
+-- Date: 2026-10-15
+-- ==============================================
+
+-- Une ligne par vue: jours < refreshed_until complets dans la vue au dernier
+-- rafraîchissement (flask refresh-dashboard-views). Les jours suivants sont lus
+-- sur orders / order_items tant que la vue n'a pas été rafraîchie.
+-- Aucune ligne: la vue n'est jamais lue.
+CREATE TABLE IF NOT EXISTS dashboard_views_refresh (
+    view_name VARCHAR(100) PRIMARY KEY,
+    refreshed_until DATE NOT NULL,
+    refreshed_at TIMESTAMP NOT NULL
+);
+
+COMMENT ON TABLE dashboard_views_refresh IS 'Limite de fraîcheur des vues matérialisées du dashboard (jours complets exclusifs)';
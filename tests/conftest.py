@@ -0,0 +1,153 @@
+"""
+Fixtures de test: application (TestingConfig, SQLite en mémoire), client,
+jeu de données et compteur de requêtes SQL.
+"""
+from contextlib import contextmanager
+from decimal import Decimal
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app import create_app
+from app.extensions import db
+from app.models import User, Category, Product, Stock, Order, OrderItem
+from app.models.order import OrderStatus
+from app.core.security import get_token_claims
+
+
+def _clear_caches():
+    """Caches par processus: rien ne doit passer d'un test (d'une base) à l'autre"""
+    from app.core.cache import dashboard_cache
+    from app.core.security import token_versions_cache
+    from app.services.order_service import order_counts_cache
+    from app.services.dashboard_service import etat_stocks_cache, views_refresh_cache
+    from app.api.v1.products import product_cache, price_history_cache
+    from app.api.v1.categories import (
+        categories_version_cache, categories_payload_cache, category_schema, categories_schema
+    )
+
+    for cache in (
+        dashboard_cache, token_versions_cache, order_counts_cache, etat_stocks_cache,
+        views_refresh_cache, product_cache, price_history_cache,
+        categories_version_cache, categories_payload_cache, category_schema, categories_schema
+    ):
+        cache.clear()
+
+
+@pytest.fixture
+def app():
+    """
+    Application de test, base SQLite en mémoire neuve.
+    Aucun contexte applicatif n'est gardé ouvert: chaque requête du client a sa
+    propre session, comme en production (identity map vide).
+    """
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+
+    _clear_caches()
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    """En-tête Authorization d'un administrateur"""
+    with app.app_context():
+        user = User(email='admin@example.com', nom='Admin', prenom='Super', role='admin', is_active=True)
+        user.set_password('admin123')
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=user.id, additional_claims=get_token_claims(user))
+
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def seed(app):
+    """
+    Crée une catégorie, des produits (avec stock) et `count` commandes
+    confirmées de deux lignes chacune, assignées à un livreur.
+    Retourne l'id de la catégorie.
+    """
+    state = {}
+
+    def create(count):
+        with app.app_context():
+            if 'category_id' not in state:
+                livreur = User(email='livreur@example.com', nom='Livreur', prenom='Pierre', role='livreur', is_active=True)
+                livreur.set_password('livreur123')
+                category = Category(nom='Plats', is_active=True)
+                db.session.add_all([livreur, category])
+                db.session.flush()
+
+                for i in range(3):
+                    product = Product(nom=f'Produit {i}', prix=Decimal('10.00'), sku=f'SKU{i}', category_id=category.id)
+                    db.session.add(product)
+                    db.session.flush()
+                    db.session.add(Stock(product_id=product.id, quantity=50, seuil_alerte=10))
+                db.session.commit()
+
+                state.update(category_id=category.id, livreur_id=livreur.id, orders=0)
+
+            products = Product.query.filter_by(category_id=state['category_id']).order_by(Product.id).all()
+            for _ in range(count):
+                state['orders'] += 1
+                order = Order(
+                    numero=f"CMD-TEST-{state['orders']}",
+                    status=OrderStatus.CONFIRMEE.value,
+                    client_nom=f"Client {state['orders']}",
+                    livreur_id=state['livreur_id']
+                )
+                for product in products[:2]:
+                    item = OrderItem(product_id=product.id, quantity=2, prix_unitaire=product.prix)
+                    item.calculate_total()
+                    order.items.append(item)
+                order.calculate_total()
+                db.session.add(order)
+            db.session.commit()
+
+        return state['category_id']
+
+    return create
+
+
+@pytest.fixture
+def query_counter(app):
+    """
+    Compte les requêtes SQL exécutées dans le bloc:
+
+        with query_counter() as counter:
+            client.get(...)
+        assert counter.count <= 3
+    """
+    with app.app_context():
+        engine = db.engine
+
+    class Counter:
+        count = 0
+
+    @contextmanager
+    def count_queries():
+        counter = Counter()
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            counter.count += 1
+
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield counter
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    return count_queries
@@ -0,0 +1,40 @@
+"""
+ETag / If-None-Match: 304 aussi pour les réponses compressées par Flask-Compress,
+dont l'ETag est suffixé par l'algorithme ("<etag>:gzip").
+"""
+from app.extensions import db
+from app.models import Category
+
+
+def test_compressed_etag_round_trip(app, client, auth_headers):
+    with app.app_context():
+        # Corps au-delà de COMPRESS_MIN_SIZE: la réponse est compressée
+        db.session.add_all([
+            Category(nom=f'Catégorie {i}', description='Description ' * 10, ordre=i, is_active=True)
+            for i in range(20)
+        ])
+        db.session.commit()
+
+    headers = {**auth_headers, 'Accept-Encoding': 'gzip'}
+    response = client.get('/api/v1/categories/all', headers=headers)
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+    etag = response.headers['ETag']
+    assert etag.endswith(':gzip"')
+
+    response = client.get('/api/v1/categories/all', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+
+
+def test_plain_etag_round_trip(app, client, auth_headers):
+    with app.app_context():
+        db.session.add(Category(nom='Plats', is_active=True))
+        db.session.commit()
+
+    response = client.get('/api/v1/categories/all', headers=auth_headers)
+    assert response.status_code == 200
+
+    response = client.get('/api/v1/categories/all', headers={**auth_headers, 'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
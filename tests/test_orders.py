@@ -0,0 +1,19 @@
+"""
+GET /orders hors PostgreSQL: OrderService.orders_json sérialise via OrderSchema
+(même contenu que le JSON construit par PostgreSQL).
+"""
+
+
+def test_orders_sqlite_fallback_payload(client, seed, auth_headers):
+    seed(2)
+    response = client.get('/api/v1/orders?sort=numero&order=asc', headers=auth_headers)
+
+    assert response.status_code == 200
+    items = response.get_json()['items']
+    assert [o['numero'] for o in items] == ['CMD-TEST-1', 'CMD-TEST-2']
+
+    order = items[0]
+    assert order['items_count'] == 2
+    assert order['montant_total'] == 40.0
+    assert order['livreur']['nom'] == 'Livreur'
+    assert [item['product']['sku'] for item in order['items']] == ['SKU0', 'SKU1']
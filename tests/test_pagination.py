@@ -0,0 +1,65 @@
+"""
+Pagination: COUNT(*) exact par défaut, estimation du planificateur seulement
+sur demande (paginate_page(..., estimate=True)) et sauf exact_count.
+"""
+import pytest
+
+from app.core import utils
+from app.models import Order
+
+
+@pytest.fixture
+def large_estimate(app, monkeypatch):
+    """Estimation au-delà du seuil; enregistre chaque appel"""
+    calls = []
+
+    def estimate_count(query):
+        calls.append(query)
+        return app.config['PAGINATION_COUNT_ESTIMATE_THRESHOLD'] + 1
+
+    monkeypatch.setattr(utils, 'estimate_count', estimate_count)
+    return calls
+
+
+def test_exact_count_by_default(app, seed, large_estimate):
+    seed(3)
+    with app.app_context():
+        rows, pagination = utils.paginate_page(Order.query, 1, 2)
+
+    assert len(rows) == 2
+    assert pagination['total'] == 3
+    assert pagination['pages'] == 2
+    assert 'total_estimate' not in pagination
+    assert large_estimate == []
+
+
+def test_estimate_opt_in(app, seed, large_estimate):
+    seed(3)
+    with app.app_context():
+        rows, pagination = utils.paginate_page(Order.query.order_by(Order.id), 1, 2, estimate=True)
+
+    assert len(rows) == 2
+    assert pagination['total'] is None
+    assert pagination['pages'] is None
+    assert pagination['total_estimate'] == app.config['PAGINATION_COUNT_ESTIMATE_THRESHOLD'] + 1
+    assert pagination['has_next'] is True
+
+
+def test_exact_count_overrides_estimate(app, seed, large_estimate):
+    seed(3)
+    with app.app_context():
+        _, pagination = utils.paginate_page(Order.query, 1, 2, estimate=True, exact_count=True)
+
+    assert pagination['total'] == 3
+    assert large_estimate == []
+
+
+def test_orders_list_exact_total_on_sqlite(client, seed, auth_headers):
+    # Hors PostgreSQL, pas d'estimation: total exact même avec estimate=True
+    seed(3)
+    response = client.get('/api/v1/orders?per_page=2', headers=auth_headers)
+
+    assert response.status_code == 200
+    pagination = response.get_json()['pagination']
+    assert pagination['total'] == 3
+    assert 'total_estimate' not in pagination
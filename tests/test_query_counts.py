@@ -0,0 +1,65 @@
+"""
+Nombre de requêtes SQL par endpoint: il ne doit pas croître avec le nombre de
+lignes renvoyées (régression N+1 = une requête par commande, ligne ou produit).
+"""
+from decimal import Decimal
+
+from app.extensions import db
+from app.models import Product
+from app.core.cache import dashboard_cache
+
+
+def _count_queries(client, query_counter, url, headers):
+    # Réponses du dashboard en cache: chaque mesure doit exécuter la vue
+    dashboard_cache.clear()
+    with query_counter() as counter:
+        response = client.get(url, headers=headers)
+        # Réponses en flux: les requêtes s'exécutent pendant la lecture du corps
+        response.get_data()
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return counter.count
+
+
+def _assert_constant(client, query_counter, seed, auth_headers, url):
+    seed(2)
+    few = _count_queries(client, query_counter, url, auth_headers)
+    seed(6)
+    many = _count_queries(client, query_counter, url, auth_headers)
+    assert many == few, f'{url}: {few} requêtes pour 2 commandes, {many} pour 8'
+    return many
+
+
+def test_orders_query_count(client, query_counter, seed, auth_headers):
+    count = _assert_constant(client, query_counter, seed, auth_headers, '/api/v1/orders')
+    # Page d'ids + COUNT, puis commandes avec lignes, produits et livreurs préchargés
+    assert count <= 6
+
+
+def test_orders_minimal_info_query_count(client, query_counter, seed, auth_headers):
+    count = _assert_constant(client, query_counter, seed, auth_headers, '/api/v1/orders_minimal_info')
+    # Page + COUNT, lignes (selectin) et livreurs (selectin)
+    assert count <= 5
+
+
+def test_commandes_details_query_count(client, query_counter, seed, auth_headers):
+    count = _assert_constant(client, query_counter, seed, auth_headers, '/api/v1/dashboard/commandes-details')
+    # Commandes, puis un SELECT ... IN par relation (lignes, produits, catégories, livreurs)
+    assert count <= 6
+
+
+def test_category_products_single_query(app, client, query_counter, seed, auth_headers):
+    category_id = seed(1)
+    with app.app_context():
+        db.session.add(Product(nom='Inactif', prix=Decimal('5.00'), sku='OFF', category_id=category_id, is_active=False))
+        db.session.commit()
+
+    url = f'/api/v1/categories/{category_id}/products'
+    with query_counter() as counter:
+        response = client.get(url, headers=auth_headers)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    # Catégorie, produits actifs et products_count (produits non supprimés) en une requête
+    assert counter.count == 1
+    assert len(data['products']) == 3
+    assert data['category']['products_count'] == 4